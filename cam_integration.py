@@ -1,19 +1,31 @@
 """
 Program for integrating audio/video into a meeting
-Handles only up to one audio and one video stream in one meeting
+Handles up to one audio and several video streams in one meeting,
+all shared by one participant
+Streams are ingested once per host and shared by all integrations using them
 """
+import atexit
+import collections
+import contextlib
+import fcntl
+import glob
+import json
+import queue
+import re
 import signal
+import socketserver
 import threading
 from types import FrameType
-from typing import NoReturn
+from typing import Iterator, NoReturn
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions
 
 import sys
@@ -21,17 +33,206 @@ import time
 import subprocess
 import os
 import shlex
+import shutil
 import argparse
 import logging
 
 CAMERA_NAME = "virtual_camera"
 MIC_NAME = "virtual_mic"
 RUNNING = True
-driver = None
 CAMERA_READY = False
 ffplay_pid = 0
-ffmpeg_pid = 0
+# pids of the ffmpeg processes by url of the video stream
+ffmpeg_pids = {}
+# names of the virtual cameras of the video streams, in order of the streams
+CAMERA_NAMES = []
+VIDEO_STREAMS = []
+# private directory of the ingest registry, its locks and the ingest logs,
+# shared by all integrations of the user on this host
+RUNTIME_DIRECTORY = f"/tmp/bbb_cam-{os.getuid()}"
+INGEST_REGISTRY = os.path.join(RUNTIME_DIRECTORY, "bbb_cam_ingest.json")
+INGEST_SLOTS = 8
+FIRST_DEVICE_NUMBER = 10
+INGEST_ACQUIRED = threading.Event()
+WATCHDOG_INTERVAL = 30
+BROWSER_MEMORY_LIMIT = 3 * 2**30
+RENDERER_RESPONSE_LIMIT = 5.0
+WEBDRIVER_ERROR_LIMIT = 10
+# times of WebDriver errors within the last minute
+WEBDRIVER_ERRORS = collections.deque()
+REJOIN_RETRY_DELAY = 10
+next_watchdog_check = 0
+next_memory_check = 0
+PROFILE_DIRECTORY = None
+# maximum size of the http and code cache of the browser profile
+CACHE_SIZE = 512 * 2**20
+# profile entries holding cookies, session state or locks,
+# relative to the profile directory
+PROFILE_SESSION_STATE = [
+    "SingletonLock", "SingletonSocket", "SingletonCookie",
+    "Default/Cookies", "Default/Cookies-journal",
+    "Default/Network/Cookies", "Default/Network/Cookies-journal",
+    "Default/Local Storage", "Default/Session Storage", "Default/Sessions",
+    "Default/IndexedDB", "Default/Service Worker",
+    "Default/Current Session", "Default/Current Tabs",
+    "Default/Last Session", "Default/Last Tabs",
+]
+DECODER_CPUS = None
+BROWSER_CPUS = None
 MANUAL_MUTE = False
+STATE_FILE = None
+RESUME_STATE = {}
+TRACE_FILE = "cam_integration_trace.jsonl"
+TRACE_BUFFER_SIZE = 1024
+TRACE_SPANS = collections.deque(maxlen=TRACE_BUFFER_SIZE)
+SESSION_ID = None
+SESSION_START = time.time()
+SESSION_OUTCOME = "exit"
+# ids of the handled messages of the private chats, not persisted, as a new
+# participant starts with new private chats
+HANDLED_MESSAGES = set()
+VIDEO_QUALITY = None
+CONFIGURED_VIDEO_QUALITY = None
+# wakes up the ffmpeg thread, e.g. to restart the ingests in RESTART_REQUESTS
+INGEST_RESTART = threading.Event()
+RESTART_REQUESTS = set()
+INGEST_LOG_DIRECTORY = RUNTIME_DIRECTORY
+# events of the content analysis as tuples of kind, stream url and event
+CONTENT_EVENTS = queue.Queue()
+CONTENT_ACTION = "log"
+# commands of the control socket with the corresponding chat commands
+CONTROL_COMMANDS = {
+    "mute": "/mute",
+    "unmute": "/unmute",
+    "togglemic": "/togglemic",
+    "share": "/share_cam",
+    "unshare": "/unshare_cam",
+}
+CONTROL_REQUESTS = queue.Queue()
+CONTROL_PENDING = threading.Event()
+CONTROL_TIMEOUT = 30
+CONTENT_EVENT_DESCRIPTIONS = {
+    "freeze": "frozen", "black": "black", "silence": "silent"}
+FREEZE_DURATION = 10
+BLACK_DURATION = 10
+SILENCE_DURATION = 30
+SILENCE_THRESHOLD = "-50dB"
+INGEST_FILTER = None
+# quality profiles from lowest to highest: BBB quality value,
+# maximum ingest width and ingest fps
+QUALITY_PROFILES = [
+    ("low", 640, 10),
+    ("medium", 960, 15),
+    ("high", 1280, 25),
+    ("hd", 1920, 30),
+]
+ADAPTIVE_QUALITY = False
+CPU_HIGH_THRESHOLD = 85.0
+CPU_LOW_THRESHOLD = 60.0
+QUALITY_CHECK_INTERVAL = 10
+QUALITY_DOWN_SAMPLES = 3
+QUALITY_UP_SAMPLES = 6
+quality_level = None
+quality_ceiling = None
+quality_samples = 0
+next_quality_check = 0
+last_cpu_times = None
+STATS_FILE = "cam_integration_stats.jsonl"
+STATS_INTERVAL = 5
+# one hour of samples at the default interval, the series is appended to
+# the stats file when it is full and every STATS_FLUSH_INTERVAL seconds
+STATS_SERIES = collections.deque(maxlen=720)
+STATS_FLUSH_INTERVAL = 300
+next_stats_collection = 0
+next_stats_flush = 0
+last_webrtc_stats = None
+# keeps track of the peer connections of the page, so their stats can be read
+PEER_CONNECTION_HOOK = """
+window.__peerConnections = [];
+const NativePeerConnection = window.RTCPeerConnection;
+window.RTCPeerConnection = function(...args) {
+    const pc = new NativePeerConnection(...args);
+    window.__peerConnections.push(pc);
+    return pc;
+};
+window.RTCPeerConnection.prototype = NativePeerConnection.prototype;
+Object.setPrototypeOf(window.RTCPeerConnection, NativePeerConnection);
+"""
+# a second browser in the meeting that takes over publishing when the
+# health checks of the primary browser fail
+STANDBY = False
+STANDBY_CHECK_INTERVAL = 1
+# driver and profile name of the joined standby browser
+standby_browser = None
+standby_thread = None
+next_standby_check = 0
+
+
+class Browser(threading.local):
+    """
+    Browser driven by the helper functions, per thread, as the standby
+    browser joins the meeting in a background thread
+    """
+    driver = None
+    profile_name = None
+
+
+browser = Browser()
+
+
+@contextlib.contextmanager
+def trace_span(phase: str) -> Iterator[None]:
+    """
+    Record duration and outcome of a phase in the trace ring buffer
+    Only a tuple is stored per span, formatting happens in flush_trace()
+
+    Args:
+        phase (str): name of the phase to be traced
+    """
+    start_ts = time.time()
+    start = time.monotonic()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        TRACE_SPANS.append((phase, start_ts, time.monotonic() - start,
+                            outcome))
+
+
+def flush_trace() -> None:
+    """
+    Append the recorded spans of this session as json lines to the trace file
+    The last line summarizes the whole session
+    """
+    if not TRACE_FILE:
+        return
+    spans = list(TRACE_SPANS)
+    TRACE_SPANS.clear()
+    spans.append(("session", SESSION_START, time.time() - SESSION_START,
+                  SESSION_OUTCOME))
+    try:
+        with open(TRACE_FILE, "a") as f:
+            for phase, start_ts, duration, outcome in spans:
+                f.write(json.dumps({"session": SESSION_ID, "phase": phase,
+                                    "start": round(start_ts, 3),
+                                    "duration": round(duration, 3),
+                                    "outcome": outcome}) + "\n")
+    except OSError:
+        logging.warning(f"Trace could not be written to {TRACE_FILE}")
+
+
+def stop_ingest_thread() -> None:
+    """
+    Let the ffmpeg thread release the ingests and end, the process only
+    exits once this non-daemon thread has ended
+    """
+    global RUNNING
+    RUNNING = False
+    # wake up the ffmpeg thread, which releases the ingests
+    INGEST_RESTART.set()
 
 
 def exit_program() -> NoReturn:
@@ -42,21 +243,11 @@ def exit_program() -> NoReturn:
         NoReturn: Does not return, since the program exits
     """
     logging.info("Exiting cam_integration!")
-    global RUNNING
-    RUNNING = False
-    if ffplay_pid:
-        try:
-            os.kill(ffplay_pid, signal.SIGKILL)
-        except OSError:
-            logging.warning("ffplay could not be killed, "
-                            "maybe already killed")
-    if ffmpeg_pid:
-        try:
-            os.kill(ffmpeg_pid, signal.SIGKILL)
-        except OSError:
-            logging.warning("ffmpeg could not be killed, "
-                            "maybe already killed")
-    driver.quit()
+    stop_ingest_thread()
+    if browser.driver:
+        browser.driver.quit()
+    if standby_browser:
+        standby_browser[0].quit()
     sys.exit(0)
 
 
@@ -72,73 +263,497 @@ def signal_handler(sig: int, frame: FrameType) -> None:
     exit_program()
 
 
-def create_loopback_device(device_number: int, camera_name: str) -> None:
+def create_loopback_devices(first_device_number: int, num_devices: int,
+                            camera_name: str) -> None:
     """
-    Uses the v4l2loopback module to create a virtual camera device
+    Uses the v4l2loopback module to create the pool of virtual camera devices
     Removes previous v4l2loopback modules, as only one can be active at a time
 
     Args:
-        device_number (int): video device numver of the virtual device
-        camera_name (str): name of the virtual camera
+        first_device_number (int): video device number of the first device
+        num_devices (int): number of virtual devices to create
+        camera_name (str): name prefix of the virtual cameras
     """
+    device_numbers = range(first_device_number,
+                           first_device_number + num_devices)
+    video_nrs = ",".join(str(number) for number in device_numbers)
+    card_labels = ",".join(f"{camera_name}_{number}"
+                           for number in device_numbers)
+    # exclusive_caps is set per device, Chrome only lists devices with it
+    exclusive_caps = ",".join("1" for number in device_numbers)
     subprocess.run("sudo modprobe -r v4l2loopback", shell=True)
     time.sleep(1)
-    subprocess.run(f'sudo modprobe v4l2loopback video_nr={device_number}'
-                   f' card_label="{camera_name}" exclusive_caps=1', shell=True)
+    subprocess.run(f'sudo modprobe v4l2loopback devices={num_devices}'
+                   f' video_nr={video_nrs} card_label="{card_labels}"'
+                   f' exclusive_caps={exclusive_caps}', shell=True)
     time.sleep(1)
 
 
-def manage_ffmpeg(
-        video_stream: str, audio_stream: str, device_number: int) -> None:
+def prepare_runtime_directory() -> None:
+    """
+    Create the private runtime directory, other users must not be able to
+    replace the registry, its locks or the ingest logs
+    Exits if the directory belongs to another user or is accessible by
+    others
+    """
+    os.makedirs(RUNTIME_DIRECTORY, mode=0o700, exist_ok=True)
+    stat = os.lstat(RUNTIME_DIRECTORY)
+    if not os.path.isdir(RUNTIME_DIRECTORY) \
+            or os.path.islink(RUNTIME_DIRECTORY) \
+            or stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        logging.critical(f"Runtime directory {RUNTIME_DIRECTORY} is not "
+                         "private! Aborting.")
+        exit(-1)
+
+
+@contextlib.contextmanager
+def ingest_registry() -> Iterator[dict]:
+    """
+    Lock the per-host registry of running ingests and yield its content
+    Changes to the yielded dict are written back when the context is left
+
+    The registry maps "<kind> <stream url>" to the slot of the ingest (the
+    virtual device or sink it plays into), the pid of its ffmpeg/ffplay
+    process and the pids of the integrations consuming it
+    """
+    with open(f"{INGEST_REGISTRY}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(INGEST_REGISTRY, "r") as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            registry = {}
+        try:
+            yield registry
+        finally:
+            with open(INGEST_REGISTRY, "w") as f:
+                json.dump(registry, f)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def loopback_devices_lock(exclusive: bool) -> Iterator[None]:
+    """
+    Lock the pool of virtual camera devices, shared while a video ingest is
+    added to the registry and exclusive while the devices are created again
+
+    Args:
+        exclusive (bool): True, to lock the devices exclusively
+    """
+    with open(f"{INGEST_REGISTRY}.devices.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def prepare_loopback_devices() -> None:
+    """
+    Create the pool of virtual camera devices again, if no video ingest is
+    running on this host
+    The registry is not locked while the devices are created
+    """
+    with loopback_devices_lock(exclusive=True):
+        with ingest_registry() as registry:
+            prune_ingest_registry(registry)
+            devices_used = any(key.startswith("video ") for key in registry)
+        if not devices_used:
+            create_loopback_devices(FIRST_DEVICE_NUMBER, INGEST_SLOTS,
+                                    CAMERA_NAME)
+
+
+def process_alive(pid: int) -> bool:
+    """
+    Check whether a process with the given pid exists
+
+    Args:
+        pid (int): pid of the process
+
+    Returns:
+        bool: True, if the process exists
+    """
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def kill_process(pid: int, name: str) -> None:
+    """
+    Kill the process with the given pid
+
+    Args:
+        pid (int): pid of the process
+        name (str): name of the process for logging
     """
-    Starts the ffmpeg/ffplay proesses to retrieve the rtsp/audio stream
+    if not pid:
+        return
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except OSError:
+        logging.warning(f"{name} could not be killed, maybe already killed")
+
+
+def stop_ingest(kind: str, ingest: dict) -> None:
+    """
+    Stop the process of an ingest and free its resources
+
+    Args:
+        kind (str): "video" or "audio"
+        ingest (dict): entry of the ingest in the registry
+    """
+    kill_process(ingest["pid"], "ffmpeg" if kind == "video" else "ffplay")
+    for module in ingest.get("modules", []):
+        subprocess.run(f"pactl unload-module {module}", shell=True)
+
+
+def prune_ingest_registry(registry: dict) -> None:
+    """
+    Remove dead consumers from the registry and stop ingests without
+    consumers, e.g., left behind by crashed integrations
+
+    Args:
+        registry (dict): content of the ingest registry
+    """
+    for key, ingest in list(registry.items()):
+        ingest["consumers"] = [pid for pid in ingest["consumers"]
+                               if process_alive(pid)]
+        if not ingest["consumers"]:
+            logging.info(f"Stopping ingest without consumers: {key}")
+            stop_ingest(key.split(" ", 1)[0], ingest)
+            del registry[key]
+
+
+def start_ingest_process(kind: str, stream_url: str, slot: int) -> int:
+    """
+    Start the ffmpeg/ffplay process of an ingest, without waiting for
+    the virtual camera device to receive video
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+        slot (int): slot of the ingest
+
+    Returns:
+        int: pid of the started process
+    """
+    if kind == "video":
+        return get_video_stream(stream_url, FIRST_DEVICE_NUMBER + slot)
+    return get_audio_stream(stream_url, slot)
+
+
+def acquire_ingest(kind: str, stream_url: str) -> dict:
+    """
+    Get the ingest of the given stream, starting it only if no other
+    integration on this host is already ingesting the same stream
+    Waits for the virtual camera device of a video ingest after the
+    registry is unlocked again
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+
+    Returns:
+        dict: entry of the ingest in the registry
+    """
+    key = f"{kind} {stream_url}"
+    if kind == "video":
+        prepare_loopback_devices()
+        devices_lock = loopback_devices_lock(exclusive=False)
+    else:
+        devices_lock = contextlib.nullcontext()
+    with devices_lock, ingest_registry() as registry:
+        prune_ingest_registry(registry)
+        if key in registry:
+            ingest = registry[key]
+            ingest["consumers"].append(os.getpid())
+            if process_alive(ingest["pid"]):
+                logging.info(f"Sharing running {kind} ingest of {stream_url}")
+            else:
+                # the other consumers are alive, keep their slot
+                logging.info(f"Restarting {kind} ingest of {stream_url}")
+                ingest["pid"] = start_ingest_process(kind, stream_url,
+                                                     ingest["slot"])
+            ingest = dict(ingest)
+        else:
+            used_slots = [ingest["slot"]
+                          for other_key, ingest in registry.items()
+                          if other_key.startswith(f"{kind} ")]
+            free_slots = [slot for slot in range(INGEST_SLOTS)
+                          if slot not in used_slots]
+            if not free_slots:
+                logging.critical(f"No free slot for another {kind} ingest!")
+                return None
+            ingest = {"slot": free_slots[0], "consumers": [os.getpid()]}
+            if kind == "audio":
+                ingest["modules"] = create_virtual_mic(
+                    ingest["slot"], MIC_NAME, cleanup=not used_slots)
+            ingest["pid"] = start_ingest_process(kind, stream_url,
+                                                 ingest["slot"])
+            registry[key] = ingest
+            ingest = dict(ingest)
+
+    if kind == "video" and ingest["pid"]:
+        wait_for_video_device(FIRST_DEVICE_NUMBER + ingest["slot"])
+    return ingest
+
+
+def restart_ingest(kind: str, stream_url: str, pid: int) -> int:
+    """
+    Restart the process of an ingest, unless another consumer already
+    replaced the process given by pid
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+        pid (int): pid of the process that is to be replaced
+
+    Returns:
+        int: pid of the running process of the ingest
+    """
+    key = f"{kind} {stream_url}"
+    with ingest_registry() as registry:
+        ingest = registry.get(key)
+        if not ingest:
+            return 0
+        slot = ingest["slot"]
+        if ingest["pid"] == pid or not process_alive(ingest["pid"]):
+            kill_process(pid, "ffmpeg" if kind == "video" else "ffplay")
+            ingest["pid"] = start_ingest_process(kind, stream_url, slot)
+        # otherwise already restarted by another consumer
+        new_pid = ingest["pid"]
+
+    if kind == "video" and new_pid:
+        wait_for_video_device(FIRST_DEVICE_NUMBER + slot)
+    return new_pid
+
+
+def release_ingest(kind: str, stream_url: str) -> None:
+    """
+    Stop consuming the ingest of the given stream, the ingest is stopped if
+    this was its last consumer
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+    """
+    key = f"{kind} {stream_url}"
+    with ingest_registry() as registry:
+        if ingest := registry.get(key):
+            if os.getpid() in ingest["consumers"]:
+                ingest["consumers"].remove(os.getpid())
+        prune_ingest_registry(registry)
+
+
+def is_ingest_shared(kind: str, stream_url: str) -> bool:
+    """
+    Check whether other integrations consume the ingest of the given stream
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+
+    Returns:
+        bool: True, if the ingest has other consumers
+    """
+    with ingest_registry() as registry:
+        ingest = registry.get(f"{kind} {stream_url}")
+        return bool(ingest) and len(ingest["consumers"]) > 1
+
+
+def manage_ffmpeg(video_streams: list, audio_stream: str) -> None:
+    """
+    Acquires the ingests of the rtsp/audio streams, which starts the
+    ffmpeg/ffplay processes if they are not shared with another integration
     Monitors the cpu usage of the ffmpeg/ffplay processes
     and restarts them if needed
 
     Args:
-        video_stream (str): url of the video stream
+        video_streams (list): urls of the video streams
         audio_stream (str): url of the audio stream
-        device_number (int): video device number of the virtual device
     """
-    global ffmpeg_pid
     global ffplay_pid
-
-    if video_stream:
-        ffmpeg_pid = get_video_stream(video_stream, device_number)
+    global MIC_NAME, CAMERA_READY
+
+    for video_stream in video_streams:
+        with trace_span("acquire_video_ingest"):
+            ingest = acquire_ingest("video", video_stream)
+        if not ingest:
+            os.kill(os.getpid(), signal.SIGINT)
+            return
+        ffmpeg_pids[video_stream] = ingest["pid"]
+        CAMERA_NAMES.append(
+            f"{CAMERA_NAME}_{FIRST_DEVICE_NUMBER + ingest['slot']}")
+        threading.Thread(target=watch_content, daemon=True,
+                         args=("video", video_stream, ingest["slot"])).start()
     if audio_stream:
-        ffplay_pid = get_audio_stream(audio_stream)
+        with trace_span("acquire_audio_ingest"):
+            ingest = acquire_ingest("audio", audio_stream)
+        if not ingest:
+            os.kill(os.getpid(), signal.SIGINT)
+            return
+        ffplay_pid = ingest["pid"]
+        MIC_NAME = f"{MIC_NAME}_{ingest['slot']}"
+        threading.Thread(target=watch_content, daemon=True,
+                         args=("audio", audio_stream, ingest["slot"])).start()
+    INGEST_ACQUIRED.set()
+    CAMERA_READY = bool(video_streams)
 
     while RUNNING:
-        if video_stream and not monitor_process(ffmpeg_pid, 1.0):
-            logging.error("Restarting ffmpeg!")
-            try:
-                os.kill(ffmpeg_pid, signal.SIGKILL)
-            except OSError:
-                logging.warning("ffmpeg could not be killed, "
-                                "maybe already killed")
-            ffmpeg_pid = get_video_stream(video_stream, device_number)
+        for video_stream, ffmpeg_pid in ffmpeg_pids.items():
+            if not monitor_process(ffmpeg_pid, 1.0):
+                logging.error(f"Restarting ffmpeg of {video_stream}!")
+                ffmpeg_pids[video_stream] = restart_ingest(
+                    "video", video_stream, ffmpeg_pid)
 
         if audio_stream and not monitor_process(ffplay_pid, 1.0):
             logging.error("Restarting ffplay!")
+            ffplay_pid = restart_ingest("audio", audio_stream, ffplay_pid)
+
+        if INGEST_RESTART.wait(10) and RUNNING:
+            # restart requested, e.g. to apply new ingest parameters
+            INGEST_RESTART.clear()
+            while RESTART_REQUESTS:
+                kind, stream_url = RESTART_REQUESTS.pop()
+                logging.info(f"Restarting {kind} ingest of {stream_url}!")
+                if kind == "video" and stream_url in ffmpeg_pids:
+                    ffmpeg_pids[stream_url] = restart_ingest(
+                        "video", stream_url, ffmpeg_pids[stream_url])
+                elif kind == "audio" and stream_url == audio_stream:
+                    ffplay_pid = restart_ingest("audio", stream_url,
+                                                ffplay_pid)
+            CAMERA_READY = bool(video_streams)
+    for video_stream in video_streams:
+        release_ingest("video", video_stream)
+    if audio_stream:
+        release_ingest("audio", audio_stream)
+
+
+def get_ingest_log(kind: str, slot: int) -> str:
+    """
+    Get the path of the log file of an ingest process, which is read by all
+    integrations consuming the ingest
+
+    Args:
+        kind (str): "video" or "audio"
+        slot (int): slot of the ingest
+
+    Returns:
+        str: path of the log file
+    """
+    return os.path.join(INGEST_LOG_DIRECTORY, f"bbb_cam_{kind}{slot}.log")
+
+
+def watch_content(kind: str, stream_url: str, slot: int) -> None:
+    """
+    Follow the log of an ingest process and turn the output of the freeze,
+    black and silence detection filters into content events
+    The analysis filters run on the frames the ingest decodes anyway
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+        slot (int): slot of the ingest
+    """
+    log_path = get_ingest_log(kind, slot)
+    log = None
+    black_frame = None
+    black_seconds = 0
+    while RUNNING:
+        if log is None:
             try:
-                os.kill(ffplay_pid, signal.SIGKILL)
+                log = open(log_path, "r")
             except OSError:
-                logging.warning("ffplay could not be killed, "
-                                "maybe already killed")
-            ffplay_pid = get_audio_stream(audio_stream)
-        time.sleep(10)
-    if ffmpeg_pid:
-        try:
-            os.kill(ffmpeg_pid, signal.SIGKILL)
-        except OSError:
-            logging.warning("ffmpeg could not be killed, "
-                            "maybe already killed")
-    if ffplay_pid:
-        try:
-            os.kill(ffplay_pid, signal.SIGKILL)
-        except OSError:
-            logging.warning("ffplay could not be killed, "
-                            "maybe already killed")
+                time.sleep(1)
+                continue
+        if os.path.getsize(log_path) < log.tell():
+            # the ingest was restarted and the log truncated
+            log.seek(0)
+        line = log.readline()
+        if not line:
+            time.sleep(0.5)
+            continue
+
+        if "freeze_start" in line:
+            CONTENT_EVENTS.put((kind, stream_url, "freeze"))
+        elif "freeze_end" in line:
+            CONTENT_EVENTS.put((kind, stream_url, "freeze_end"))
+        elif "silence_start" in line:
+            CONTENT_EVENTS.put((kind, stream_url, "silence"))
+        elif "silence_end" in line:
+            CONTENT_EVENTS.put((kind, stream_url, "silence_end"))
+        elif match := re.search(r"blackframe.*frame:(\d+)", line):
+            # blackframe runs at one frame per second and logs every black
+            # frame, consecutive frame numbers mean continuous black
+            frame = int(match.group(1))
+            if black_frame is not None and frame == black_frame + 1:
+                black_seconds += 1
+            else:
+                black_seconds = 1
+            black_frame = frame
+            if black_seconds == BLACK_DURATION:
+                CONTENT_EVENTS.put((kind, stream_url, "black"))
+    if log:
+        log.close()
+
+
+def handle_content_events() -> None:
+    """
+    Act on the events of the content analysis according to CONTENT_ACTION
+    """
+    while not CONTENT_EVENTS.empty():
+        kind, stream_url, event = CONTENT_EVENTS.get()
+        if event.endswith("_end"):
+            logging.info(f"{kind} stream {stream_url} recovered from "
+                         f"{event[:-len('_end')]}")
+            continue
+
+        message = f"The {kind} stream {stream_url} is "\
+                  f"{CONTENT_EVENT_DESCRIPTIONS[event]}!"
+        logging.error(message)
+        if CONTENT_ACTION == "restart":
+            request_ingest_restart(kind, stream_url)
+        elif CONTENT_ACTION == "notify":
+            notify_moderators(message)
+
+
+def request_ingest_restart(kind: str, stream_url: str) -> None:
+    """
+    Ask the ffmpeg thread to restart the ingest of the given stream
+
+    Args:
+        kind (str): "video" or "audio"
+        stream_url (str): url of the stream
+    """
+    RESTART_REQUESTS.add((kind, stream_url))
+    INGEST_RESTART.set()
+
+
+def notify_moderators(message: str) -> None:
+    """
+    Send the message to all moderators with an open private chat
+
+    Args:
+        message (str): Message to be sent
+    """
+    num_chat_partners = len(get_moderator_chat_partners())
+    for index in range(num_chat_partners):
+        chat_partners = get_moderator_chat_partners()
+        if index >= len(chat_partners):
+            break
+        chat_partners[index].click()
+        time.sleep(1)
+        # opening the chat reads its messages, so handle its commands now
+        handle_chat_commands()
+        send_chat_message(message)
+        time.sleep(1)
+        close_chat()
 
 
 def monitor_process(pid: int, threshold: float) -> bool:
@@ -182,6 +797,7 @@ def get_video_stream(stream_url: str, device_number: int) -> int:
     """
     Uses ffmpeg to retrieve the rtsp stream and
     play it into the virtual camera device
+    Does not wait for the device, see wait_for_video_device()
 
     Args:
         stream_url (str): url of the video stream
@@ -190,19 +806,44 @@ def get_video_stream(stream_url: str, device_number: int) -> int:
     Returns:
         int: pid of the created ffmpeg process
     """
-    command = f"ffmpeg -loglevel error -rtsp_transport tcp -i {stream_url} -f"\
-              f" v4l2 -vcodec rawvideo -pix_fmt yuv420p"\
-              f" /dev/video{device_number}"
+    # the content analysis runs on one decoded frame per second
+    ingest_filter = f"{INGEST_FILTER}," if INGEST_FILTER else ""
+    filter_graph = f"[0:v]{ingest_filter}split[out][probe];"\
+                   f"[probe]fps=1,freezedetect=d={FREEZE_DURATION},"\
+                   f"blackframe=amount=98,nullsink"
+    command = f"ffmpeg -hide_banner -nostats -loglevel info"\
+              f" -rtsp_transport tcp -i {stream_url}"\
+              f" -filter_complex '{filter_graph}' -map [out]"
+    if DECODER_CPUS:
+        command = f"taskset -c {DECODER_CPUS} {command}"
+    command += f" -f v4l2 -vcodec rawvideo -pix_fmt yuv420p"\
+               f" /dev/video{device_number}"
+    log_path = get_ingest_log("video", device_number - FIRST_DEVICE_NUMBER)
     if RUNNING:
-        ffmpeg_proc = subprocess.Popen(shlex.split(command),
-                                       stdin=subprocess.PIPE, shell=False)
+        with open(log_path, "w") as log:
+            ffmpeg_proc = subprocess.Popen(shlex.split(command),
+                                           stdin=subprocess.PIPE,
+                                           stderr=log, shell=False)
     else:
         return 0
 
+    logging.info(f"ffmpeg PID: {ffmpeg_proc.pid}")
+
+    return ffmpeg_proc.pid
+
+
+def wait_for_video_device(device_number: int) -> None:
+    """
+    Wait until the virtual camera device receives video
+
+    Args:
+        device_number (int): video device number of the virtual camera
+    """
     result = None
     while RUNNING:
-        result = subprocess.run("v4l2-ctl --device=10 --all | "
-                                "grep 'Size Image' head -1 |awk '{print $4}'",
+        result = subprocess.run(f"v4l2-ctl --device={device_number} --all | "
+                                "grep 'Size Image' | head -1 |"
+                                "awk '{print $4}'",
                                 capture_output=True, shell=True)
         logging.debug(f"Current size image: {result.stdout}")
         if result.stdout != b"0\n":
@@ -211,29 +852,30 @@ def get_video_stream(stream_url: str, device_number: int) -> int:
 
     logging.debug(f"Result of v4l2-ctl command: {result.stdout}")
 
-    global CAMERA_READY
-    CAMERA_READY = True
 
-    logging.info(f"ffmpeg PID: {ffmpeg_proc.pid}")
-
-    return ffmpeg_proc.pid
-
-
-def get_audio_stream(stream_url: str) -> int:
+def get_audio_stream(stream_url: str, slot: int) -> int:
     """
     Uses ffplay to play the sound of the rtsp stream
     This sound should be picked up by the virtual mic
 
     Args:
         stream_url (str): url of the audio stream
+        slot (int): slot of the virtual mic to play the sound into
 
     Returns:
         int: pid of the created ffplay process
     """
-    command = f"ffplay -loglevel error -rtsp_transport"\
-              f" tcp -nodisp {stream_url}"
+    command = f"ffplay -hide_banner -nostats -loglevel info"\
+              f" -rtsp_transport tcp -nodisp"\
+              f" -af silencedetect=n={SILENCE_THRESHOLD}:d={SILENCE_DURATION}"\
+              f" {stream_url}"
+    if DECODER_CPUS:
+        command = f"taskset -c {DECODER_CPUS} {command}"
+    env = dict(os.environ, PULSE_SINK=f"virtmic{slot}")
     if RUNNING:
-        ffplay_proc = subprocess.Popen(shlex.split(command), shell=False)
+        with open(get_ingest_log("audio", slot), "w") as log:
+            ffplay_proc = subprocess.Popen(shlex.split(command), shell=False,
+                                           stderr=log, env=env)
     else:
         return 0
     logging.info(f"ffplay PID: {ffplay_proc.pid}")
@@ -241,31 +883,46 @@ def get_audio_stream(stream_url: str) -> int:
     return ffplay_proc.pid
 
 
-def create_virtual_mic(microphone_name: str) -> None:
+def create_virtual_mic(slot: int, microphone_name: str,
+                       cleanup: bool = False) -> list:
     """
     Create virtual microphone for audio playback
 
     Args:
-        microphone_name (str): name the virtual microphone should get
-    """
-    subprocess.run("pactl unload-module module-remap-source", shell=True)
-    subprocess.run("pactl unload-module module-null-sink", shell=True)
+        slot (int): slot of the virtual microphone, used to tell apart
+                    the virtual microphones of several ingests
+        microphone_name (str): name prefix the virtual microphone should get
+        cleanup (bool): Whether to unload all previously created virtual
+                        microphones first
 
-    null_sink_cmd = "pactl load-module module-null-sink sink_name=virtmic"\
-                    " sink_properties=device.description="\
-                    "Virtual_Microphone_Sink"
+    Returns:
+        list: ids of the loaded pulseaudio modules
+    """
+    if cleanup:
+        subprocess.run("pactl unload-module module-remap-source", shell=True)
+        subprocess.run("pactl unload-module module-null-sink", shell=True)
+
+    null_sink_cmd = f"pactl load-module module-null-sink "\
+                    f"sink_name=virtmic{slot} "\
+                    f"sink_properties=device.description="\
+                    f"Virtual_Microphone_Sink_{slot}"
     module_null_sink_output = subprocess.run(null_sink_cmd, shell=True,
                                              capture_output=True, text=True)
 
-    remap_source_cmd = f"pactl load-module module-remap-source master=virtmic"\
-                       f".monitor source_name=virtmic source_properties="\
-                       f"device.description={microphone_name}"
+    remap_source_cmd = f"pactl load-module module-remap-source "\
+                       f"master=virtmic{slot}.monitor "\
+                       f"source_name=virtmic{slot} source_properties="\
+                       f"device.description={microphone_name}_{slot}"
     module_remap_source_output = subprocess.run(remap_source_cmd, shell=True,
                                                 capture_output=True, text=True)
 
     logging.info(f"module-null-sink: {module_null_sink_output.stdout}")
     logging.info(f"module-remap-source: {module_remap_source_output.stdout}")
 
+    return [output.stdout.strip() for output in
+            (module_remap_source_output, module_null_sink_output)
+            if output.stdout.strip()]
+
 
 def wait_for(element: tuple, timeout: int = 10) -> None:
     """
@@ -275,10 +932,10 @@ def wait_for(element: tuple, timeout: int = 10) -> None:
         element (tuple): element to be waited for
         timeout (int, optional): maximum time to wait. Defaults to 10.
     """
-    WebDriverWait(driver, timeout).until(
+    WebDriverWait(browser.driver, timeout).until(
             expected_conditions.presence_of_element_located(element))
-    WebDriverWait(driver, timeout).until(expected_conditions
-                                         .element_to_be_clickable(element))
+    WebDriverWait(browser.driver, timeout).until(
+            expected_conditions.element_to_be_clickable(element))
 
 
 def click_button_xpath(button_xpath: str) -> None:
@@ -291,12 +948,12 @@ def click_button_xpath(button_xpath: str) -> None:
     try:
         # wait for button to be clickable and the cllick it
         wait_for((By.XPATH, button_xpath))
-        element = driver.find_element(by=By.XPATH, value=button_xpath)
-        driver.execute_script("arguments[0].click();", element)
+        element = browser.driver.find_element(by=By.XPATH, value=button_xpath)
+        browser.driver.execute_script("arguments[0].click();", element)
     except NoSuchElementException:
         logging.critical(f"Button with XPath: {button_xpath} "
                          "not found! Aborting.")
-        driver.quit()
+        browser.driver.quit()
         exit(-1)
 
 
@@ -311,11 +968,12 @@ def fill_input_xpath(input_xpath: str, input: str) -> None:
     try:
         # wait for input field to be available and the fill it with the input
         wait_for((By.XPATH, input_xpath))
-        driver.find_element(by=By.XPATH, value=input_xpath).send_keys(input)
+        browser.driver.find_element(by=By.XPATH,
+                                    value=input_xpath).send_keys(input)
     except NoSuchElementException:
         logging.critical(f"Input with XPath: {input_xpath} not found! "
                          "Aborting.")
-        driver.quit()
+        browser.driver.quit()
         exit(-1)
 
 
@@ -328,7 +986,8 @@ def select_option_by_value(select_xpath: str, option_value: str) -> None:
         option_value (str): value of the option to be selected
     """
     wait_for((By.XPATH, select_xpath))
-    select = Select(driver.find_element(by=By.XPATH, value=select_xpath))
+    select = Select(browser.driver.find_element(by=By.XPATH,
+                                                value=select_xpath))
     select.select_by_value(option_value)
 
 
@@ -341,7 +1000,8 @@ def select_option(select_xpath: str, option_text: str) -> None:
         option_text (str): text of the option to be selected
     """
     wait_for((By.XPATH, select_xpath))
-    select = Select(driver.find_element(by=By.XPATH, value=select_xpath))
+    select = Select(browser.driver.find_element(by=By.XPATH,
+                                                value=select_xpath))
     select.select_by_visible_text(option_text)
 
 
@@ -353,7 +1013,8 @@ def select_last_option(select_xpath: str) -> None:
         select_xpath (str): xpath of the dropdown menu
     """
     wait_for((By.XPATH, select_xpath))
-    select = Select(driver.find_element(by=By.XPATH, value=select_xpath))
+    select = Select(browser.driver.find_element(by=By.XPATH,
+                                                value=select_xpath))
     num_options = len(select.options)
     select.select_by_index(num_options - 1)
 
@@ -367,7 +1028,7 @@ def check_microphone_muted() -> bool:
     """
     try:
         umute_button_xpath = '//*[@aria-label="Unmute"]'
-        driver.find_element(by=By.XPATH, value=umute_button_xpath)
+        browser.driver.find_element(by=By.XPATH, value=umute_button_xpath)
         # Unmute button exists, therefore currrently muted
         return True
     except NoSuchElementException:
@@ -404,39 +1065,89 @@ def toggle_microphone() -> None:
         mute_microphone()
 
 
-def get_moderator_chat_partner() -> WebElement:
+def get_moderator_chat_partners() -> list:
     """
-    Get first moderator chat partner from list of chat partners
+    Get all moderator chat partners from list of chat partners
 
     Returns:
-        WebElement: Element that opens private chat with moderator
+        list: Elements that open the private chats with moderators
     """
     # list chat participants
     userlist_xpath = '//*[@data-test="userListContent"]'
-    userlist = driver.find_element(by=By.XPATH, value=userlist_xpath)
+    userlist = browser.driver.find_element(by=By.XPATH, value=userlist_xpath)
 
     chatlist_xpath = './/*[@role="tabpanel"]//*[@data-test="moderatorAvatar"]'
 
-    if chat_partners := userlist.find_elements(
-        by=By.XPATH, value=chatlist_xpath
-    ):
-        return chat_partners[0]
+    return userlist.find_elements(by=By.XPATH, value=chatlist_xpath)
 
-    return None
 
+def get_unread_chats(chat_partners: list) -> list:
+    """
+    Get the chats with unread messages from the unread counters of the list
+    of chats with one round trip, so chats without new messages are not
+    opened
+
+    Args:
+        chat_partners (list): Elements that open the private chats
 
-def get_last_chat_message() -> str:
+    Returns:
+        list: Index in chat_partners and name of the chats with unread
+              messages
     """
-    Get last chat message of current private chat
+    entries = browser.driver.execute_script(
+        "return arguments[0].map(avatar => {"
+        "const item = avatar.closest('[role=\"button\"]')"
+        " || avatar.parentElement.parentElement;"
+        "return [(item.innerText || '').trim().split('\\n')[0],"
+        "item.querySelector('[data-test=\"unreadMessages\"],"
+        " [class*=\"unreadMessages\"]') !== null];});", chat_partners)
+    return [(index, name) for index, (name, unread) in enumerate(entries)
+            if unread]
+
+
+def get_chat_messages() -> list:
+    """
+    Get all messages of current private chat with one round trip
+    A message is identified by the time of its group of messages and its
+    position within the group, which stay the same when the list of
+    messages is virtualized or grouped differently
 
     Returns:
-        str: Text in last message
+        list: Ids and texts of the messages, oldest first
+    """
+    return browser.driver.execute_script(
+        "const selector = '[data-test=\"chatUserMessageText\"]';"
+        "return Array.from(document.querySelectorAll(selector)).map(m => {"
+        "let group = m.parentElement, time = null;"
+        "while (group && !(time = group.querySelector('time[datetime]')))"
+        " group = group.parentElement;"
+        "const messages = Array.from("
+        "(group || document).querySelectorAll(selector));"
+        "const sent = time ? Date.parse(time.getAttribute('datetime')) : 0;"
+        "return [sent + ':' + messages.indexOf(m), m.innerText];});")
+
+
+def get_new_commands(messages: list) -> list:
     """
-    messages_xpath = './/*[@data-test="chatUserMessageText"]'
-    messages = driver.find_elements(by=By.XPATH, value=messages_xpath)
+    Get the commands in messages that have not been handled yet and mark
+    them as handled
+    Only messages starting with "/" are commands, which also excludes the
+    replies of the integration itself.
 
-    # at least one message, as there would not be a chat otherwise
-    return messages[-1].text
+    Args:
+        messages (list): Ids and texts of the messages, oldest first
+
+    Returns:
+        list: Commands to be executed, oldest first
+    """
+    commands = []
+    for message_id, message in messages:
+        if message_id in HANDLED_MESSAGES:
+            continue
+        HANDLED_MESSAGES.add(message_id)
+        if message.strip().startswith("/"):
+            commands.append(message.strip())
+    return commands
 
 
 def close_chat() -> None:
@@ -448,23 +1159,63 @@ def close_chat() -> None:
     time.sleep(0.5)
 
 
-def check_chats() -> None:
+def handle_chat_commands(chat_name: str = "a moderator") -> None:
     """
-    Check, whether there is a new message from a moderator and execute the
-    command in the message
+    Execute the new commands of the open private chat in order
+    Replies to the commands are sent as a single message
+    Messages arriving meanwhile are read by BBB as the chat is open,
+    therefore the chat is checked again until there are no new commands
+
+    Args:
+        chat_name (str, optional): Name of the chat partner, for logging
     """
-    chat_partner = get_moderator_chat_partner()
+    handled = False
+    while commands := get_new_commands(get_chat_messages()):
+        handled = True
+        replies = []
+        for command in commands:
+            logging.info(f"Executing command {command} from {chat_name}")
+            if reply := execute_command(command):
+                if reply not in replies:
+                    replies.append(reply)
+        if replies:
+            send_chat_message(" ".join(replies))
+            time.sleep(1)
+    if handled:
+        save_state()
 
-    if not chat_partner:
-        return
 
-    # open chat
-    chat_partner.click()
-    time.sleep(1)
+def check_chats(execute_commands: bool = True) -> None:
+    """
+    Check the private chats with moderators that have unread messages and
+    execute the commands in them in order
+
+    Args:
+        execute_commands (bool, optional): False, to only mark the messages
+                                           as handled, e.g., the messages
+                                           sent to a standby browser before
+                                           its promotion. Defaults to True.
+    """
+    chat_partners = get_moderator_chat_partners()
+    # opening a chat reads its messages, bound the loop in case BBB does not
+    # clear an unread counter
+    for _ in range(len(chat_partners)):
+        unread_chats = get_unread_chats(chat_partners)
+        if not unread_chats:
+            break
+        index, chat_name = unread_chats[0]
 
-    message = get_last_chat_message()
-    execute_command(message)
-    close_chat()
+        # open chat
+        chat_partners[index].click()
+        time.sleep(1)
+        if execute_commands:
+            handle_chat_commands(chat_name)
+        else:
+            get_new_commands(get_chat_messages())
+        close_chat()
+        # the list is rendered again after closing a chat, therefore the
+        # elements have to be looked up again
+        chat_partners = get_moderator_chat_partners()
 
 
 def send_chat_message(message: str) -> None:
@@ -480,27 +1231,31 @@ def send_chat_message(message: str) -> None:
     click_button_xpath(send_button_xpath)
 
 
-def send_chat_help() -> None:
+def get_chat_help() -> str:
     """
-    Send a help message to current chat partner
+    Get the help message listing the supported commands
+
+    Returns:
+        str: Help message
     """
-    send_chat_message("Supported commands:")
-    send_chat_message("/mute: Mute the audio.")
-    send_chat_message("/unmute: Unmute the audio.")
-    send_chat_message("/togglemic: Toggle audio mute. Mute if not currently \
-                      muted, unmute if currently muted.")
-    send_chat_message("/unshare_cam: Disable video stream.")
-    send_chat_message("/share_cam: Enable video stream (If video stream \
-                      is provided).")
-    time.sleep(1)
+    return ("Supported commands: "
+            "/mute: Mute the audio. "
+            "/unmute: Unmute the audio. "
+            "/togglemic: Toggle audio mute. Mute if not currently muted, "
+            "unmute if currently muted. "
+            "/unshare_cam: Disable video stream. "
+            "/share_cam: Enable video stream (If video stream is provided).")
 
 
-def execute_command(command: str) -> None:
+def execute_command(command: str) -> str:
     """
     Execute the given command
 
     Args:
         command (str): Command to execute
+
+    Returns:
+        str: Reply to be sent to the chat partner, or None if no reply
     """
     global MANUAL_MUTE
     if command == "/mute":
@@ -517,22 +1272,24 @@ def execute_command(command: str) -> None:
     elif command == "/share_cam":
         share_camera()
     elif command == "/help":
-        send_chat_help()
+        return get_chat_help()
     else:
-        print(command)
-        send_chat_help()
+        logging.warning(f"Unknown command: {command}")
+        return get_chat_help()
+    return None
 
 
 def check_camera_shared() -> bool:
     """
     Check if camera is currently shared by inspecting the share camera button
+    With multiple cameras, this is True while any of them is shared
 
     Returns:
         bool: True, if currently sharing camera
     """
     try:
         unshare_button_xpath = '//*[@aria-label="Stop sharing webcam"]'
-        driver.find_element(by=By.XPATH, value=unshare_button_xpath)
+        browser.driver.find_element(by=By.XPATH, value=unshare_button_xpath)
         # Stop sharing button exists, therefore currrently sharing camera
         return True
     except NoSuchElementException:
@@ -540,50 +1297,761 @@ def check_camera_shared() -> bool:
         return False
 
 
+def check_dialog_camera_shared() -> bool:
+    """
+    Check if the camera selected in the open sharing dialogue is shared,
+    the dialogue then offers to stop sharing it
+
+    Returns:
+        bool: True, if the selected camera is shared
+    """
+    try:
+        stop_sharing_xpath = '//*[@aria-label="Stop sharing"]'
+        browser.driver.find_element(by=By.XPATH, value=stop_sharing_xpath)
+        return True
+    except NoSuchElementException:
+        return False
+
+
 def unshare_camera() -> None:
     """
     Disable camera sharing
+    With multiple cameras, the webcam button opens the sharing dialogue,
+    so each camera is stopped from the dialogue
     """
     if not check_camera_shared():
         # not currently sharing camera
         return
 
-    unshare_camera_xpath = '//*[@aria-label="Stop sharing webcam"]'
-    click_button_xpath(unshare_camera_xpath)
+    if len(CAMERA_NAMES) <= 1:
+        unshare_camera_xpath = '//*[@aria-label="Stop sharing webcam"]'
+        click_button_xpath(unshare_camera_xpath)
+        return
+
+    for camera_name in CAMERA_NAMES:
+        if not check_camera_shared():
+            break
+        open_camera_dialog(camera_name)
+        if check_dialog_camera_shared():
+            stop_sharing()
+        close_camera_dialog()
 
 
 def share_camera() -> None:
     """
-    Share camera
+    Share the virtual cameras of all video streams
+    Sharing more than one camera requires multiple webcams to be enabled in
+    BBB, then the webcam button opens the sharing dialogue again while a
+    camera is already shared, cameras that are shared already are skipped
     """
-    if check_camera_shared():
+    if len(CAMERA_NAMES) <= 1 and check_camera_shared():
         # already sharing camera
         return
 
-    share_camera_xpath = '//*[@aria-label="Share webcam"]'
-    click_button_xpath(share_camera_xpath)
-    time.sleep(5)
+    for camera_name in CAMERA_NAMES:
+        open_camera_dialog(camera_name)
+        if check_dialog_camera_shared():
+            # already sharing this camera
+            close_camera_dialog()
+        else:
+            start_sharing()
+
+
+def open_camera_dialog(camera_name: str) -> None:
+    """
+    Open the sharing dialogue and select the camera and the video quality,
+    the camera is shared with start_sharing()
+
+    Args:
+        camera_name (str): name of the virtual camera
+    """
+    with trace_span("share_camera.open_dialog"):
+        if check_camera_shared():
+            open_dialog_xpath = '//*[@aria-label="Stop sharing webcam"]'
+        else:
+            open_dialog_xpath = '//*[@aria-label="Share webcam"]'
+        click_button_xpath(open_dialog_xpath)
+        time.sleep(5)
 
     # select the virtual camera for sharing
-    select_camera_xpath = '//*[@id="setCam"]'
-    select_option(select_camera_xpath, CAMERA_NAME)
-    time.sleep(2)
-
-    # select video quality for sharing the camera
-    if VIDEO_QUALITY:
-        select_quality_xpath = '//*[@id="setQuality"]'
-        select_option_by_value(select_quality_xpath, VIDEO_QUALITY)
-        time.sleep(3)
-
-    # start sharing the camera
-    start_sharing_xpath = '//*[@aria-label="Start sharing"]'
-    click_button_xpath(start_sharing_xpath)
-    time.sleep(1)
+    with trace_span("share_camera.select_camera"):
+        select_camera_xpath = '//*[@id="setCam"]'
+        select_option(select_camera_xpath, camera_name)
+        time.sleep(2)
+
+    # select video quality for sharing the camera, a shared camera
+    # shows no quality selection
+    if VIDEO_QUALITY and not check_dialog_camera_shared():
+        with trace_span("share_camera.select_quality"):
+            select_quality_xpath = '//*[@id="setQuality"]'
+            select_option_by_value(select_quality_xpath, VIDEO_QUALITY)
+            time.sleep(3)
+
+
+def start_sharing() -> None:
+    """
+    Start sharing the camera selected in the open sharing dialogue
+    """
+    with trace_span("share_camera.start_sharing"):
+        start_sharing_xpath = '//*[@aria-label="Start sharing"]'
+        click_button_xpath(start_sharing_xpath)
+        time.sleep(1)
+
+
+def stop_sharing() -> None:
+    """
+    Stop sharing the camera selected in the open sharing dialogue
+    """
+    with trace_span("unshare_camera.stop_sharing"):
+        stop_sharing_xpath = '//*[@aria-label="Stop sharing"]'
+        click_button_xpath(stop_sharing_xpath)
+        time.sleep(1)
+
+
+def close_camera_dialog() -> None:
+    """
+    Close the sharing dialogue, if it is still open
+    """
+    if browser.driver.find_elements(by=By.XPATH, value='//*[@id="setCam"]'):
+        browser.driver.find_element(by=By.TAG_NAME, value="body")\
+            .send_keys(Keys.ESCAPE)
+        time.sleep(1)
+
+
+def get_webrtc_stats() -> dict:
+    """
+    Read the counters of the outgoing audio and video from the stats of all
+    peer connections of the page with a single script call
+
+    Returns:
+        dict: raw counters of the outgoing "video" and "audio" streams
+    """
+    script = """
+        const done = arguments[arguments.length - 1];
+        const pcs = (window.__peerConnections || [])
+            .filter(pc => pc.connectionState !== "closed");
+        Promise.all(pcs.map(pc => pc.getStats())).then(reports => {
+            const result = {video: null, audio: null};
+            reports.forEach(report => {
+                const remote = {};
+                const sources = {};
+                report.forEach(stat => {
+                    if (stat.type === "remote-inbound-rtp") {
+                        remote[stat.localId] = stat;
+                    } else if (stat.type === "media-source") {
+                        sources[stat.id] = stat;
+                    }
+                });
+                report.forEach(stat => {
+                    if (stat.type !== "outbound-rtp"
+                            || !(stat.kind in result)
+                            || result[stat.kind]) {
+                        return;
+                    }
+                    const rtcp = remote[stat.id] || {};
+                    const source = sources[stat.mediaSourceId] || {};
+                    result[stat.kind] = {
+                        fps: stat.framesPerSecond,
+                        width: stat.frameWidth,
+                        height: stat.frameHeight,
+                        bytes_sent: stat.bytesSent,
+                        packets_sent: stat.packetsSent,
+                        frames_encoded: stat.framesEncoded,
+                        total_encode_time: stat.totalEncodeTime,
+                        quality_limitation: stat.qualityLimitationReason,
+                        packets_lost: rtcp.packetsLost,
+                        rtt: rtcp.roundTripTime,
+                        audio_level: source.audioLevel,
+                    };
+                });
+            });
+            done(result);
+        }).catch(() => done({video: null, audio: null}));
+    """
+    return browser.driver.execute_async_script(script) or {}
+
+
+def get_video_limitation_reason() -> str:
+    """
+    Get the reason the browser limits the quality of the outgoing video,
+    as reported by the stats of the peer connections
+    The latest sample of collect_webrtc_stats() is used, if it is recent
+
+    Returns:
+        str: "cpu", "bandwidth", "other" or "none", None if there is no
+             outgoing video
+    """
+    if last_webrtc_stats and \
+            time.monotonic() - last_webrtc_stats[0] < QUALITY_CHECK_INTERVAL:
+        stats = last_webrtc_stats[1]
+    else:
+        stats = get_webrtc_stats()
+    video = stats.get("video") or {}
+    return video.get("quality_limitation")
+
+
+def get_counter_rate(current: dict, previous: dict, key: str,
+                     interval: float) -> float:
+    """
+    Get the change per second of a counter between two stats samples
+
+    Args:
+        current (dict): current raw counters of a stream
+        previous (dict): previous raw counters of the same stream
+        key (str): name of the counter
+        interval (float): seconds between the samples
+
+    Returns:
+        float: change per second, None if not available
+    """
+    if (not previous or current.get(key) is None
+            or previous.get(key) is None or interval <= 0):
+        return None
+    return (current[key] - previous[key]) / interval
+
+
+def collect_webrtc_stats() -> None:
+    """
+    Add a sample of the outgoing audio and video to the stats series,
+    if the stats interval has passed
+    """
+    global next_stats_collection, next_stats_flush, last_webrtc_stats
+    now = time.monotonic()
+    if now < next_stats_collection:
+        return
+    next_stats_collection = now + STATS_INTERVAL
+
+    stats = get_webrtc_stats()
+    video = stats.get("video") or {}
+    audio = stats.get("audio") or {}
+    previous_ts, previous = last_webrtc_stats or (now, {})
+    previous_video = previous.get("video") or {}
+    previous_audio = previous.get("audio") or {}
+    last_webrtc_stats = (now, stats)
+    interval = now - previous_ts
+
+    video_bitrate = get_counter_rate(video, previous_video, "bytes_sent",
+                                     interval)
+    audio_bitrate = get_counter_rate(audio, previous_audio, "bytes_sent",
+                                     interval)
+    packet_loss = None
+    packets_sent = get_counter_rate(video, previous_video, "packets_sent",
+                                    interval)
+    packets_lost = get_counter_rate(video, previous_video, "packets_lost",
+                                    interval)
+    if packets_sent and packets_lost is not None:
+        packet_loss = max(packets_lost, 0) / packets_sent
+    encode_time_per_frame = None
+    frames = get_counter_rate(video, previous_video, "frames_encoded", 1)
+    encode_time = get_counter_rate(video, previous_video,
+                                   "total_encode_time", 1)
+    if frames and encode_time is not None:
+        encode_time_per_frame = encode_time / frames
+
+    STATS_SERIES.append((time.time(), {
+        "video_fps": video.get("fps"),
+        "video_width": video.get("width"),
+        "video_height": video.get("height"),
+        "video_bitrate": video_bitrate and 8 * video_bitrate,
+        "video_packet_loss": packet_loss,
+        "video_rtt": video.get("rtt"),
+        "video_encode_time_per_frame": encode_time_per_frame,
+        "video_quality_limitation": video.get("quality_limitation"),
+        "audio_level": audio.get("audio_level"),
+        "audio_bitrate": audio_bitrate and 8 * audio_bitrate,
+    }))
+    # write the samples early, so a long session does not lose any
+    if len(STATS_SERIES) == STATS_SERIES.maxlen or now >= next_stats_flush:
+        next_stats_flush = now + STATS_FLUSH_INTERVAL
+        flush_stats()
+
+
+def flush_stats() -> None:
+    """
+    Append the collected stats series of this session as json lines to the
+    stats file
+    """
+    if not STATS_FILE or not STATS_SERIES:
+        return
+    series = list(STATS_SERIES)
+    STATS_SERIES.clear()
+    try:
+        with open(STATS_FILE, "a") as f:
+            for ts, sample in series:
+                f.write(json.dumps({"session": SESSION_ID,
+                                    "ts": round(ts, 3), **sample}) + "\n")
+    except OSError:
+        logging.warning(f"Stats could not be written to {STATS_FILE}")
+
+
+def get_host_cpu_usage() -> float:
+    """
+    Get the cpu usage of the host since the last call from /proc/stat
+
+    Returns:
+        float: cpu usage in percent, None on the first call
+    """
+    global last_cpu_times
+    with open("/proc/stat", "r") as f:
+        cpu_times = [int(value) for value in f.readline().split()[1:]]
+    previous, last_cpu_times = last_cpu_times, cpu_times
+    if not previous:
+        return None
+
+    # idle and iowait are the 4th and 5th value
+    idle = sum(cpu_times[3:5]) - sum(previous[3:5])
+    total = sum(cpu_times) - sum(previous)
+    if total <= 0:
+        return None
+    return 100.0 * (total - idle) / total
+
+
+def set_quality_level(level: int) -> None:
+    """
+    Apply the quality profile given by level to the ingest and the shared
+    camera, a shared camera is shared again with the new settings
+
+    Args:
+        level (int): index of the profile in QUALITY_PROFILES
+    """
+    global CAMERA_READY, INGEST_FILTER
+    logging.info(f"Switching video quality from "
+                 f"{QUALITY_PROFILES[quality_level][0]} to "
+                 f"{QUALITY_PROFILES[level][0]}")
+    select_quality_profile(level)
+
+    with trace_span("set_quality_level"):
+        camera_shared = check_camera_shared()
+        unshare_camera()
+        if any(is_ingest_shared("video", video_stream)
+               for video_stream in VIDEO_STREAMS):
+            # other integrations rely on the ingest parameters
+            INGEST_FILTER = None
+        elif VIDEO_STREAMS:
+            CAMERA_READY = False
+            for video_stream in VIDEO_STREAMS:
+                request_ingest_restart("video", video_stream)
+            while not CAMERA_READY:
+                time.sleep(1)
+        if camera_shared:
+            share_camera()
+    save_state()
+
+
+def select_quality_profile(level: int) -> None:
+    """
+    Set the BBB quality and ingest parameters for the quality profile given
+    by level, they are used the next time the ingest and camera are started
+
+    Args:
+        level (int): index of the profile in QUALITY_PROFILES
+    """
+    global quality_level, VIDEO_QUALITY, INGEST_FILTER
+    quality, width, fps = QUALITY_PROFILES[level]
+    quality_level = level
+    # at the configured quality the stream is ingested unchanged
+    if level == quality_ceiling:
+        VIDEO_QUALITY = CONFIGURED_VIDEO_QUALITY
+        INGEST_FILTER = None
+    else:
+        VIDEO_QUALITY = quality
+        # keep the aspect ratio and never scale up, which would only add
+        # load, the comma in min() is escaped for the filter graph
+        INGEST_FILTER = f"scale=min(iw\\,{width}):-2,fps={fps}"
+
+
+def adapt_video_quality() -> None:
+    """
+    Step the video quality down if the host or the encoder of the browser
+    is overloaded and back up if there is headroom again
+    Steps are only taken after several consecutive samples in the same
+    direction, so the quality does not oscillate
+    """
+    global quality_samples, next_quality_check
+    if time.monotonic() < next_quality_check:
+        return
+    next_quality_check = time.monotonic() + QUALITY_CHECK_INTERVAL
+
+    if not check_camera_shared():
+        # nothing to adapt, camera was unshared by a moderator
+        quality_samples = 0
+        return
+
+    cpu_usage = get_host_cpu_usage()
+    if cpu_usage is None:
+        return
+    reason = get_video_limitation_reason()
+    logging.debug(f"Host cpu usage: {cpu_usage:.1f}%, "
+                  f"quality limitation: {reason}")
+
+    if cpu_usage > CPU_HIGH_THRESHOLD or reason == "cpu":
+        # negative samples count towards stepping down
+        quality_samples = min(quality_samples, 0) - 1
+    elif cpu_usage < CPU_LOW_THRESHOLD and reason in ("none", None):
+        quality_samples = max(quality_samples, 0) + 1
+    else:
+        quality_samples = 0
+
+    if quality_samples <= -QUALITY_DOWN_SAMPLES and quality_level > 0:
+        quality_samples = 0
+        set_quality_level(quality_level - 1)
+    elif (quality_samples >= QUALITY_UP_SAMPLES
+          and quality_level < quality_ceiling):
+        quality_samples = 0
+        set_quality_level(quality_level + 1)
+
+
+def save_state() -> None:
+    """
+    Write the runtime state changed by moderators or the quality controller
+    to the state file, so a restarted integration can resume from it
+    """
+    if not STATE_FILE:
+        return
+    state = {
+        "manual_mute": MANUAL_MUTE,
+        "microphone_muted": check_microphone_muted(),
+        "camera_shared": check_camera_shared(),
+        "quality_level": quality_level,
+        # quality selected on the control socket, see set_video_quality()
+        "configured_video_quality": CONFIGURED_VIDEO_QUALITY,
+        "quality_ceiling": quality_ceiling,
+    }
+    try:
+        # write to a temporary file first, so the state file is never partial
+        with open(f"{STATE_FILE}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{STATE_FILE}.tmp", STATE_FILE)
+    except OSError:
+        logging.warning(f"State could not be written to {STATE_FILE}")
+
+
+def load_state() -> dict:
+    """
+    Load the runtime state of a previous run of this integration
+
+    Returns:
+        dict: state of the previous run, empty if there is none
+    """
+    if not STATE_FILE or not os.path.exists(STATE_FILE):
+        return {}
+    try:
+        with open(STATE_FILE, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"State could not be read from {STATE_FILE}")
+        return {}
+    logging.info(f"Resuming from state: {state}")
+    return state
+
+
+def evict_cache(cache_directories: list, max_size: int) -> None:
+    """
+    Remove the least recently modified cache files until the caches are
+    below the given size
+
+    Args:
+        cache_directories (list): paths of the cache directories
+        max_size (int): maximum size of all caches in bytes
+    """
+    cache_files = []
+    for cache_directory in cache_directories:
+        for directory, _, files in os.walk(cache_directory):
+            for file in files:
+                path = os.path.join(directory, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                cache_files.append((stat.st_mtime, stat.st_size, path))
+
+    size = sum(file_size for _, file_size, _ in cache_files)
+    if size <= max_size:
+        return
+    logging.info(f"Evicting browser cache of {size} bytes")
+    for _, file_size, path in sorted(cache_files):
+        if size <= max_size:
+            break
+        try:
+            os.remove(path)
+            size -= file_size
+        except OSError:
+            pass
+
+
+def prepare_browser_profile(name: str) -> str:
+    """
+    Prepare the persistent browser profile of this integration
+    Cookies and session state of the previous meeting are removed, while the
+    http cache is kept, so the BBB client loads from the local cache
+
+    Args:
+        name (str): name of the integration, identifies the profile
+
+    Returns:
+        str: path of the profile directory
+    """
+    profile = os.path.join(PROFILE_DIRECTORY, name)
+    os.makedirs(profile, exist_ok=True)
+
+    # state of a previous meeting and locks left by a crashed browser
+    for entry in PROFILE_SESSION_STATE:
+        path = os.path.join(profile, entry)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+    evict_cache([os.path.join(profile, "Default", cache)
+                 for cache in ("Cache", "Code Cache")], CACHE_SIZE)
+    return profile
+
+
+def get_browser_pids(browser_driver: webdriver.Chrome) -> list:
+    """
+    Get the pids of chromedriver and all processes started by it
+
+    Args:
+        browser_driver (webdriver.Chrome): driver of the browser
+
+    Returns:
+        list: pids of chromedriver and chrome processes
+    """
+    try:
+        root_pid = browser_driver.service.process.pid
+    except AttributeError:
+        return []
+
+    children = collections.defaultdict(list)
+    for stat_file in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(stat_file, "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the command name in parentheses may contain spaces
+        pid, fields = stat.split(" ", 1)[0], stat.rsplit(")", 1)[1].split()
+        children[int(fields[1])].append(int(pid))
+
+    pids = [root_pid]
+    for pid in pids:
+        pids.extend(children[pid])
+    return pids
+
+
+def get_browser_memory() -> int:
+    """
+    Get the proportional memory (PSS) of chromedriver and chrome, which
+    counts pages shared between the processes only once in total
+
+    Returns:
+        int: proportional memory in bytes
+    """
+    memory = 0
+    for pid in get_browser_pids(browser.driver):
+        try:
+            with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        memory += int(line.split()[1]) * 1024
+                        break
+        except (OSError, IndexError, ValueError):
+            pass
+    return memory
+
+
+def check_browser_health() -> str:
+    """
+    Check the browser against the limits of the watchdog
+    The WebDriver error rate is checked on every call, memory and
+    responsiveness of the renderer every WATCHDOG_INTERVAL seconds, the
+    responsiveness more often with a standby browser
+
+    Returns:
+        str: reason why the browser is unhealthy, None if it is healthy
+    """
+    global next_watchdog_check, next_memory_check
+    now = time.monotonic()
+    while WEBDRIVER_ERRORS and WEBDRIVER_ERRORS[0] < now - 60:
+        WEBDRIVER_ERRORS.popleft()
+    if len(WEBDRIVER_ERRORS) >= WEBDRIVER_ERROR_LIMIT:
+        return f"{len(WEBDRIVER_ERRORS)} WebDriver errors in the last minute"
+
+    if now < next_watchdog_check:
+        return None
+    # a standby browser can take over within a second
+    next_watchdog_check = now + (STANDBY_CHECK_INTERVAL if STANDBY
+                                 else WATCHDOG_INTERVAL)
+
+    # finding the browser processes scans all of /proc
+    if now >= next_memory_check:
+        next_memory_check = now + WATCHDOG_INTERVAL
+        memory = get_browser_memory()
+        logging.debug(f"Browser memory: {memory / 2**20:.0f} MiB")
+        if BROWSER_MEMORY_LIMIT and memory > BROWSER_MEMORY_LIMIT:
+            return f"browser uses {memory / 2**20:.0f} MiB of memory"
+
+    start = time.monotonic()
+    try:
+        browser.driver.execute_script("return 1;")
+    except WebDriverException:
+        return "renderer does not respond"
+    response_time = time.monotonic() - start
+    if response_time > RENDERER_RESPONSE_LIMIT:
+        return f"renderer responded after {response_time:.1f} seconds"
+
+    if STANDBY and check_connection_failed():
+        return "media connection failed"
+    return None
+
+
+def check_connection_failed() -> bool:
+    """
+    Check if a peer connection of the page, i.e., the connection of the
+    camera or the microphone to the meeting, failed
+
+    Returns:
+        bool: True, if a peer connection failed
+    """
+    try:
+        return browser.driver.execute_script(
+            "return (window.__peerConnections || [])"
+            ".some(pc => pc.connectionState === 'failed');")
+    except WebDriverException:
+        return True
+
+
+def close_browser(browser_driver: webdriver.Chrome) -> None:
+    """
+    Quit the browser, killing its processes if it does not quit by itself
+
+    Args:
+        browser_driver (webdriver.Chrome): driver of the browser
+    """
+    pids = get_browser_pids(browser_driver)
+    try:
+        browser_driver.quit()
+    except WebDriverException:
+        logging.warning("Browser could not be quit, killing it")
+    for pid in pids:
+        if process_alive(pid):
+            kill_process(pid, "browser")
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a connection to the control socket, one command per line
+    The commands are executed by the main loop, as the driver is not thread
+    safe, and answered with one json line each
+    """
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            command = line.decode().strip()
+            if not command:
+                continue
+            reply = queue.Queue(maxsize=1)
+            CONTROL_REQUESTS.put((command, reply))
+            CONTROL_PENDING.set()
+            try:
+                result = reply.get(timeout=CONTROL_TIMEOUT)
+            except queue.Empty:
+                result = {"ok": False, "error": "timeout"}
+            self.wfile.write((json.dumps(result) + "\n").encode())
+
+
+def start_control_server(socket_path: str) -> None:
+    """
+    Listen for control commands on a unix socket in a background thread
+
+    Args:
+        socket_path (str): path of the unix socket
+    """
+    if os.path.exists(socket_path):
+        # left behind by a previous run
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path,
+                                                    ControlHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    atexit.register(os.remove, socket_path)
+    logging.info(f"Listening for control commands on {socket_path}")
+
+
+def get_status() -> dict:
+    """
+    Get the current state of the integration
+
+    Returns:
+        dict: state of microphone, camera and video quality
+    """
+    return {
+        "microphone_muted": check_microphone_muted(),
+        "manual_mute": MANUAL_MUTE,
+        "camera_shared": check_camera_shared(),
+        "video_quality": VIDEO_QUALITY,
+    }
+
+
+def set_video_quality(quality: str) -> None:
+    """
+    Set the video quality, which is also the highest quality the adaptive
+    quality controller may choose from now on
+
+    Args:
+        quality (str): BBB quality value, e.g., "medium"
+    """
+    global CONFIGURED_VIDEO_QUALITY, quality_ceiling
+    level = [profile[0] for profile in QUALITY_PROFILES].index(quality)
+    CONFIGURED_VIDEO_QUALITY = quality
+    quality_ceiling = level
+    set_quality_level(level)
+
+
+def execute_control_command(command: str) -> dict:
+    """
+    Execute a command received on the control socket
+
+    Args:
+        command (str): Command, e.g., "mute" or "quality low"
+
+    Returns:
+        dict: result of the command, including the resulting status
+    """
+    name, *args = command.split()
+    if name in CONTROL_COMMANDS:
+        execute_command(CONTROL_COMMANDS[name])
+        save_state()
+    elif name == "quality" and len(args) == 1 and args[0] in [
+            profile[0] for profile in QUALITY_PROFILES]:
+        if not VIDEO_STREAMS:
+            return {"ok": False, "error": "No video stream to set the "
+                                          "quality of"}
+        set_video_quality(args[0])
+    elif name != "status":
+        return {"ok": False, "error": f"Unknown command: {command}"}
+    return {"ok": True, **get_status()}
+
+
+def handle_control_requests() -> None:
+    """
+    Execute the pending commands of the control socket
+    """
+    CONTROL_PENDING.clear()
+    while not CONTROL_REQUESTS.empty():
+        command, reply = CONTROL_REQUESTS.get()
+        logging.info(f"Executing control command {command}")
+        try:
+            reply.put(execute_control_command(command))
+        except WebDriverException as e:
+            reply.put({"ok": False, "error": e.msg})
+            raise
 
 
 def integrate_camera(
         room_url: str, name: str, infrastructure: str,
-        video_stream: str, audio_stream: str, access_code: str) -> NoReturn:
+        video_streams: list, audio_stream: str,
+        access_code: str) -> NoReturn:
     """
     Integrate video and/or audio into a meeting
 
@@ -591,77 +2059,280 @@ def integrate_camera(
         room_url (str): url of the meeting
         name (str): name to be displayed as participant
         infrastructure (str): type of infrastructure used for the meeting room
-        video_stream (str): url of the video stream (can be None)
+        video_streams (list): urls of the video streams (can be empty)
         audio_stream (str): url of the audio stream (can be None)
         access_code (str): access code for access as moderator (can be None)
 
     Returns:
         NoReturn: Does not return, but stays in the function
     """
+    global RESUME_STATE, last_webrtc_stats
 
-    logging.debug(f"video stream: {video_stream}")
+    logging.debug(f"video streams: {video_streams}")
     logging.debug(f"audio stream: {audio_stream}")
-    # create and initialize audio resources
-    if audio_stream:
-        create_virtual_mic(MIC_NAME)
-
-    # initialize video resources, i.e., the virtual device and ffmpeg process
-    if video_stream:
-        create_loopback_device(10, CAMERA_NAME)
+    # initialize audio and video resources, i.e., the virtual devices and
+    # ffmpeg/ffplay processes, or share them with other integrations
     ffmpeg_thread = threading.Thread(target=manage_ffmpeg,
-                                     args=(video_stream, audio_stream, 10))
+                                     args=(video_streams, audio_stream))
     ffmpeg_thread.start()
 
     time.sleep(5)
 
+    join_meeting(room_url, name, infrastructure, video_streams, audio_stream,
+                 access_code)
+
+    # reason of a failed rejoin, which is retried
+    rejoin_reason = None
+    while True:
+        try:
+            if not rejoin_reason:
+                handle_control_requests()
+                check_chats()
+                if audio_stream and not MANUAL_MUTE:
+                    unmute_microphone()
+                if video_streams and ADAPTIVE_QUALITY:
+                    adapt_video_quality()
+                if STATS_INTERVAL:
+                    collect_webrtc_stats()
+                handle_content_events()
+        except WebDriverException as e:
+            logging.warning(f"WebDriver error: {e.msg}")
+            WEBDRIVER_ERRORS.append(time.monotonic())
+
+        if reason := rejoin_reason or check_browser_health():
+            WEBDRIVER_ERRORS.clear()
+            # counters of the stats start again with the new browser
+            last_webrtc_stats = None
+            RESUME_STATE = load_state()
+            promoted = False
+            if standby_browser:
+                logging.error(f"Failing over to the standby browser, "
+                              f"{reason}!")
+                try:
+                    promote_standby()
+                    promoted = True
+                except WebDriverException as e:
+                    logging.error(f"Standby browser failed, {e.msg}")
+            if not promoted:
+                # rejoin with a new browser, the ingest keeps running
+                logging.error(f"Rejoining the meeting, {reason}!")
+                # the private chats of the new participant are new
+                HANDLED_MESSAGES.clear()
+                try:
+                    with trace_span("rejoin"):
+                        close_browser(browser.driver)
+                        join_meeting(room_url, name, infrastructure,
+                                     video_streams, audio_stream, access_code,
+                                     profile_name=browser.profile_name)
+                    rejoin_reason = None
+                except WebDriverException as e:
+                    logging.error(f"Rejoining failed, {e.msg}")
+                    rejoin_reason = reason
+                    time.sleep(REJOIN_RETRY_DELAY)
+
+        if STANDBY:
+            check_standby_browser()
+            if not standby_browser and not (
+                    standby_thread and standby_thread.is_alive()):
+                start_standby(room_url, name, infrastructure,
+                              video_streams, audio_stream, access_code)
+        # wake up early for commands from the control socket
+        CONTROL_PENDING.wait(0.1)
+
+
+def start_standby(
+        room_url: str, name: str, infrastructure: str,
+        video_streams: list, audio_stream: str, access_code: str) -> None:
+    """
+    Join the meeting with the standby browser in a background thread, with
+    its own browser profile
+
+    Args:
+        room_url (str): url of the meeting
+        name (str): name to be displayed as participant
+        infrastructure (str): type of infrastructure used for the meeting room
+        video_streams (list): urls of the video streams (can be empty)
+        audio_stream (str): url of the audio stream (can be None)
+        access_code (str): access code for access as moderator (can be None)
+    """
+    global standby_thread
+    # the profiles alternate between primary and standby browser
+    if browser.profile_name == name:
+        profile_name = f"{name}_standby"
+    else:
+        profile_name = name
+    standby_thread = threading.Thread(
+        target=join_standby, daemon=True,
+        args=(room_url, name, infrastructure, video_streams, audio_stream,
+              access_code, profile_name))
+    standby_thread.start()
+
+
+def join_standby(
+        room_url: str, name: str, infrastructure: str,
+        video_streams: list, audio_stream: str, access_code: str,
+        profile_name: str) -> None:
+    """
+    Join the meeting with the standby browser, runs in the standby thread
+    See start_standby() for the arguments
+    """
+    global standby_browser
+    logging.info("Joining the meeting with a standby browser")
+    try:
+        with trace_span("standby_join"):
+            join_meeting(room_url, name, infrastructure, video_streams,
+                         audio_stream, access_code, standby=True,
+                         profile_name=profile_name)
+    except WebDriverException as e:
+        logging.error(f"Standby browser could not join the meeting, {e.msg}")
+        if browser.driver:
+            close_browser(browser.driver)
+        # wait before the main loop starts the next attempt
+        time.sleep(WATCHDOG_INTERVAL)
+        return
+    if not RUNNING:
+        browser.driver.quit()
+        return
+    standby_browser = (browser.driver, browser.profile_name)
+    logging.info("Standby browser is ready")
+
+
+def promote_standby() -> None:
+    """
+    Let the standby browser publish instead of the failed primary browser,
+    the primary browser is closed afterwards
+    The standby browser has already joined the meeting with the first camera
+    selected in the sharing dialogue and the microphone muted
+    """
+    global standby_browser
+    failed_driver = browser.driver
+    browser.driver, browser.profile_name = standby_browser
+    standby_browser = None
+    try:
+        with trace_span("promote_standby"):
+            if VIDEO_STREAMS and RESUME_STATE.get("camera_shared", True):
+                # the quality may have changed since the standby joined
+                if VIDEO_QUALITY:
+                    select_option_by_value('//*[@id="setQuality"]',
+                                           VIDEO_QUALITY)
+                start_sharing()
+                for camera_name in CAMERA_NAMES[1:]:
+                    open_camera_dialog(camera_name)
+                    start_sharing()
+            elif VIDEO_STREAMS:
+                close_camera_dialog()
+            if not MANUAL_MUTE \
+                    or not RESUME_STATE.get("microphone_muted", True):
+                unmute_microphone()
+        # commands sent to the standby participant may be hours old
+        HANDLED_MESSAGES.clear()
+        with trace_span("promote_standby.mark_chats_handled"):
+            check_chats(execute_commands=False)
+        save_state()
+    finally:
+        close_browser(failed_driver)
+
+
+def check_standby_browser() -> None:
+    """
+    Close the standby browser every WATCHDOG_INTERVAL seconds, if it does not
+    respond anymore, so a new one is started
+    """
+    global standby_browser, next_standby_check
+    if not standby_browser or time.monotonic() < next_standby_check:
+        return
+    next_standby_check = time.monotonic() + WATCHDOG_INTERVAL
+    try:
+        standby_browser[0].execute_script("return 1;")
+    except WebDriverException:
+        logging.error("Standby browser does not respond, replacing it!")
+        close_browser(standby_browser[0])
+        standby_browser = None
+
+
+def join_meeting(
+        room_url: str, name: str, infrastructure: str,
+        video_streams: list, audio_stream: str, access_code: str,
+        standby: bool = False, profile_name: str = None) -> None:
+    """
+    Start the browser, join the meeting and share the virtual devices
+
+    Args:
+        room_url (str): url of the meeting
+        name (str): name to be displayed as participant
+        infrastructure (str): type of infrastructure used for the meeting room
+        video_streams (list): urls of the video streams (can be empty)
+        audio_stream (str): url of the audio stream (can be None)
+        access_code (str): access code for access as moderator (can be None)
+        standby (bool): Whether to only select the devices without
+                        publishing, see promote_standby()
+        profile_name (str): name of the browser profile, defaults to name
+    """
     # get chrome options and add argument for granting camera permission
     # and window maximization
     options = webdriver.ChromeOptions()
     options.add_argument("--use-fake-ui-for-media-stream")
     options.add_argument("--start-maximized")
     options.add_argument("--headless")
-
-    global driver
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()),
-                              options=options)
+    browser.profile_name = profile_name or name
+    if PROFILE_DIRECTORY:
+        with trace_span("prepare_browser_profile"):
+            profile = prepare_browser_profile(browser.profile_name)
+        options.add_argument(f"--user-data-dir={profile}")
+        options.add_argument(f"--disk-cache-size={CACHE_SIZE}")
+
+    if BROWSER_CPUS:
+        # chromedriver and chrome inherit the affinity of this process,
+        # ffmpeg/ffplay are pinned to the decoder cpus when started
+        subprocess.run(f"taskset -a -cp {BROWSER_CPUS} {os.getpid()}",
+                       shell=True, capture_output=True)
+
+    with trace_span("driver_create"):
+        browser.driver = webdriver.Chrome(
+            service=Service(ChromeDriverManager().install()),
+            options=options)
+    browser.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                                   {"source": PEER_CONNECTION_HOOK})
 
     # go to initial website
-    driver.get(room_url)
+    with trace_span("driver_get"):
+        browser.driver.get(room_url)
 
     time.sleep(1)
 
     if infrastructure == "greenlight":
 
         # get field for entering the name of the user
-        enter_name_xpath = '//*[@placeholder="Enter your name!"]'
-        fill_input_xpath(enter_name_xpath, name)
-
-        time.sleep(1)
+        with trace_span("greenlight.enter_name"):
+            enter_name_xpath = '//*[@placeholder="Enter your name!"]'
+            fill_input_xpath(enter_name_xpath, name)
+            time.sleep(1)
 
         # click the join button to join the meeting
-        join_room_xpath = '//*[@id="room-join"]'
-        click_button_xpath(join_room_xpath)
-
-        time.sleep(3)
+        with trace_span("greenlight.join"):
+            join_room_xpath = '//*[@id="room-join"]'
+            click_button_xpath(join_room_xpath)
+            time.sleep(3)
 
     elif infrastructure == "studip":
-        enter_name_xpath = '//*[@name="name"]'
-        fill_input_xpath(enter_name_xpath, name)
-
-        time.sleep(1)
+        with trace_span("studip.enter_name"):
+            enter_name_xpath = '//*[@name="name"]'
+            fill_input_xpath(enter_name_xpath, name)
+            time.sleep(1)
 
         if access_code:
             # get field for entering access code
-            access_code_xpath = '//*[@name="password"]'
-            logging.info(f"Access code: {access_code}")
-            fill_input_xpath(access_code_xpath, access_code)
-            time.sleep(1)
+            with trace_span("studip.access_code"):
+                access_code_xpath = '//*[@name="password"]'
+                logging.info(f"Access code: {access_code}")
+                fill_input_xpath(access_code_xpath, access_code)
+                time.sleep(1)
 
         # click the join button to join the meeting
-        join_room_xpath = '//*[@name="accept"]'
-        click_button_xpath(join_room_xpath)
-
-        time.sleep(3)
+        with trace_span("studip.join"):
+            join_room_xpath = '//*[@name="accept"]'
+            click_button_xpath(join_room_xpath)
+            time.sleep(3)
 
     else:
         logging.critical("Wrong infrastructure parameter set!")
@@ -669,9 +2340,10 @@ def integrate_camera(
 
     # if the meeting is not started yet, the url does not change
     # therefore wait until url changes
-    while driver.current_url == room_url:
-        logging.warning("Waiting for meeting to start!")
-        time.sleep(5)
+    with trace_span("wait_meeting_start"):
+        while browser.driver.current_url == room_url:
+            logging.warning("Waiting for meeting to start!")
+            time.sleep(5)
 
     time.sleep(1)
 
@@ -679,40 +2351,54 @@ def integrate_camera(
     # listenOnly_xpath ='//*[@class="icon--2q1XXw icon-bbb-listen"]'
     # click_button_xpath(listenOnly_xpath)
 
-    if audio_stream:
-        # activate microphone
-        microphone_xpath = '//*[@aria-label="Microphone"]'
-        click_button_xpath(microphone_xpath)
-    else:
-        # go into listen only mode
-        listen_only_xpath = '//*[@aria-label="Listen only"]'
-        click_button_xpath(listen_only_xpath)
+    with trace_span("join_audio"):
+        if audio_stream:
+            # activate microphone
+            microphone_xpath = '//*[@aria-label="Microphone"]'
+            click_button_xpath(microphone_xpath)
+            if standby:
+                # mute as soon as the audio is joined, the standby browser
+                # must not be heard before its promotion
+                wait_for((By.XPATH, '//*[@aria-label="Mute"]'), timeout=30)
+                mute_microphone()
+        else:
+            # go into listen only mode
+            listen_only_xpath = '//*[@aria-label="Listen only"]'
+            click_button_xpath(listen_only_xpath)
 
-    time.sleep(10)
+        time.sleep(10)
 
-    if video_stream:
-        while not CAMERA_READY:
-            time.sleep(1)
+    if video_streams:
+        with trace_span("wait_camera_ready"):
+            while not CAMERA_READY:
+                time.sleep(1)
 
     # click the share camera button to open the sharing dialogue
-    if video_stream:
-        share_camera()
+    # unless a moderator unshared the camera before a restart
+    if video_streams and standby:
+        # the first camera is shared on promotion, see promote_standby()
+        with trace_span("standby.select_camera"):
+            open_camera_dialog(CAMERA_NAMES[0])
+    elif video_streams and RESUME_STATE.get("camera_shared", True):
+        with trace_span("share_camera"):
+            share_camera()
 
     if audio_stream:
-        # expand list for changing audio devices
-        change_audio_device_xpath = '//*[@aria-label="Change audio device"]'
-        click_button_xpath(change_audio_device_xpath)
-        time.sleep(1)
+        INGEST_ACQUIRED.wait()
+        with trace_span("select_microphone"):
+            # expand list for changing audio devices
+            change_audio_device_xpath = \
+                '//*[@aria-label="Change audio device"]'
+            click_button_xpath(change_audio_device_xpath)
+            time.sleep(1)
 
-        # choose virtual microphone by its given name
-        micname_xpath = f"//*[contains(text(),'{MIC_NAME}')]"
-        click_button_xpath(micname_xpath)
+            # choose virtual microphone by its given name
+            micname_xpath = f"//*[contains(text(),'{MIC_NAME}')]"
+            click_button_xpath(micname_xpath)
 
-    while True:
-        check_chats()
-        if audio_stream and not MANUAL_MUTE:
-            unmute_microphone()
-        time.sleep(0.1)
+        # restore the mute state set by a moderator before a restart
+        if standby or MANUAL_MUTE and RESUME_STATE.get("microphone_muted"):
+            mute_microphone()
 
 
 if __name__ == "__main__":
@@ -720,6 +2406,10 @@ if __name__ == "__main__":
                         filemode="a",
                         format="%(asctime)s - %(levelname)s - %(message)s")
 
+    # the supervisor blocks these signals and started processes inherit the
+    # signal mask, unblock them for this process and its children
+    signal.pthread_sigmask(signal.SIG_UNBLOCK,
+                           {signal.SIGCHLD, signal.SIGUSR1})
     signal.signal(signal.SIGINT, signal_handler)
 
     parser = argparse.ArgumentParser()
@@ -729,10 +2419,84 @@ if __name__ == "__main__":
     parser.add_argument("infrastructure",
                         help="Infrastructure used for the meeting room")
     parser.add_argument("--audio", help="URL of the audio stream")
-    parser.add_argument("--video", help="URL of the video stream")
+    parser.add_argument("--video", action="append",
+                        help="URL of a video stream, can be given several "
+                             "times to share several cameras")
     parser.add_argument("--code", help="Access code for joining as moderator")
     parser.add_argument("--video_quality",
                         help="Video quality to select for the stream")
+    parser.add_argument("--adaptive_quality", action="store_true",
+                        help="Lower the video quality while the host or "
+                             "the encoder is overloaded")
+    parser.add_argument("--cpu_high", type=float, default=CPU_HIGH_THRESHOLD,
+                        help="Host cpu usage in percent above which the "
+                             "video quality is lowered")
+    parser.add_argument("--cpu_low", type=float, default=CPU_LOW_THRESHOLD,
+                        help="Host cpu usage in percent below which the "
+                             "video quality is raised again")
+    parser.add_argument("--stats_interval", type=float,
+                        default=STATS_INTERVAL,
+                        help="Seconds between samples of the WebRTC stats, "
+                             "0 disables the collection")
+    parser.add_argument("--stats_file", default=STATS_FILE,
+                        help="File the WebRTC stats of the session are "
+                             "appended to as json lines")
+    parser.add_argument("--decoder_cpus",
+                        help="cpus (e.g. 0-1) to pin ffmpeg/ffplay to")
+    parser.add_argument("--browser_cpus",
+                        help="cpus (e.g. 2-7) to pin the browser to")
+    parser.add_argument("--content_action", default=CONTENT_ACTION,
+                        choices=["log", "restart", "notify"],
+                        help="Action when a stream is frozen, black or "
+                             "silent: log it, restart the ingest or notify "
+                             "the moderators in the chat")
+    parser.add_argument("--freeze_duration", type=int,
+                        default=FREEZE_DURATION,
+                        help="Seconds without change until the video "
+                             "counts as frozen")
+    parser.add_argument("--black_duration", type=int, default=BLACK_DURATION,
+                        help="Seconds of black until the video counts as "
+                             "black")
+    parser.add_argument("--silence_duration", type=int,
+                        default=SILENCE_DURATION,
+                        help="Seconds of silence until the audio counts as "
+                             "silent")
+    parser.add_argument("--silence_threshold", default=SILENCE_THRESHOLD,
+                        help="Volume below which audio counts as silence")
+    parser.add_argument("--browser_memory_limit", type=int,
+                        default=BROWSER_MEMORY_LIMIT // 2**20,
+                        help="Memory of the browser in MiB above which the "
+                             "meeting is rejoined with a new browser, "
+                             "0 disables the limit")
+    parser.add_argument("--renderer_response_limit", type=float,
+                        default=RENDERER_RESPONSE_LIMIT,
+                        help="Seconds the renderer may take to run a trivial "
+                             "script before the meeting is rejoined")
+    parser.add_argument("--webdriver_error_limit", type=int,
+                        default=WEBDRIVER_ERROR_LIMIT,
+                        help="WebDriver errors per minute after which the "
+                             "meeting is rejoined")
+    parser.add_argument("--profile_dir",
+                        help="Directory for persistent browser profiles, "
+                             "which keep the http cache between meetings")
+    parser.add_argument("--cache_size", type=int,
+                        default=CACHE_SIZE // 2**20,
+                        help="Maximum size of the browser cache in MiB")
+    parser.add_argument("--control_socket",
+                        help="Path of a unix socket to accept control "
+                             "commands on")
+    parser.add_argument("--state_file",
+                        help="File to persist the runtime state in and to "
+                             "resume from after a restart")
+    parser.add_argument("--trace_file", default=TRACE_FILE,
+                        help="File the phase timeline of the session is "
+                             "appended to as json lines")
+    parser.add_argument("--standby", action="store_true",
+                        help="Keep a second browser in the meeting, which "
+                             "takes over when the first one fails")
+    parser.add_argument("--ingest_slots", type=int, default=INGEST_SLOTS,
+                        help="Number of virtual devices of the host, has to "
+                             "be the same for all integrations of the host")
 
     args = parser.parse_args()
 
@@ -740,10 +2504,63 @@ if __name__ == "__main__":
     name = args.id
     infrastructure = args.infrastructure
     audio_stream = args.audio
-    video_stream = args.video
+    # the same stream given twice would only share the same camera twice
+    video_streams = list(dict.fromkeys(args.video or []))
+    VIDEO_STREAMS = video_streams
     access_code = args.code
-    global VIDEO_QUALITY
     VIDEO_QUALITY = args.video_quality
+    CONFIGURED_VIDEO_QUALITY = VIDEO_QUALITY
+    ADAPTIVE_QUALITY = args.adaptive_quality
+    CPU_HIGH_THRESHOLD = args.cpu_high
+    CPU_LOW_THRESHOLD = args.cpu_low
+    quality_values = [profile[0] for profile in QUALITY_PROFILES]
+    if VIDEO_QUALITY in quality_values:
+        quality_ceiling = quality_values.index(VIDEO_QUALITY)
+    else:
+        quality_ceiling = len(QUALITY_PROFILES) - 1
+    quality_level = quality_ceiling
+    TRACE_FILE = args.trace_file
+    STATS_INTERVAL = args.stats_interval
+    STATS_FILE = args.stats_file
+    SESSION_ID = f"{name}-{int(SESSION_START)}"
+    STATE_FILE = args.state_file
+    INGEST_SLOTS = args.ingest_slots
+    STANDBY = args.standby
+    CONTENT_ACTION = args.content_action
+    FREEZE_DURATION = args.freeze_duration
+    BLACK_DURATION = args.black_duration
+    SILENCE_DURATION = args.silence_duration
+    SILENCE_THRESHOLD = args.silence_threshold
+    BROWSER_MEMORY_LIMIT = args.browser_memory_limit * 2**20
+    RENDERER_RESPONSE_LIMIT = args.renderer_response_limit
+    WEBDRIVER_ERROR_LIMIT = args.webdriver_error_limit
+    PROFILE_DIRECTORY = args.profile_dir
+    CACHE_SIZE = args.cache_size * 2**20
+    DECODER_CPUS = args.decoder_cpus
+    BROWSER_CPUS = args.browser_cpus
+    prepare_runtime_directory()
+    RESUME_STATE = load_state()
+    MANUAL_MUTE = RESUME_STATE.get("manual_mute", False)
+    if RESUME_STATE.get("quality_ceiling") is not None:
+        CONFIGURED_VIDEO_QUALITY = RESUME_STATE.get("configured_video_quality")
+        quality_ceiling = RESUME_STATE["quality_ceiling"]
+    if RESUME_STATE.get("quality_level") is not None:
+        select_quality_profile(
+            min(RESUME_STATE["quality_level"], quality_ceiling))
+    atexit.register(flush_trace)
+    if args.control_socket:
+        start_control_server(args.control_socket)
+    atexit.register(flush_stats)
 
-    integrate_camera(room_url, name, infrastructure,
-                     video_stream, audio_stream, access_code)
+    try:
+        integrate_camera(room_url, name, infrastructure,
+                         video_streams, audio_stream, access_code)
+    except Exception:
+        logging.exception("cam_integration crashed!")
+        SESSION_OUTCOME = "crash"
+        # exit, so the supervisor restarts the integration right away
+        stop_ingest_thread()
+        # flush now, atexit handlers only run after the threads ended
+        atexit.unregister(flush_trace)
+        flush_trace()
+        raise
@@ -3,8 +3,17 @@ Load config yaml for the system, start and monitor cam_integration,
 when a stream is scheduled
 """
 import argparse
+import fcntl
+import functools
+import glob
+import hmac
+import http.server
+import json
 import os
 import signal
+import socket
+import queue
+import threading
 import requests
 import yaml
 from dateutil.parser import parse
@@ -13,13 +22,40 @@ import subprocess
 import shlex
 import sys
 import logging
-from typing import NoReturn
+from typing import NoReturn, Union
 from types import FrameType
 from enum import Enum
 
 CONFIGURATION = None
 active_process = None
 PYTHON = "python3"
+STATE_DIRECTORY = "state"
+CONTROL_DIRECTORY = "control"
+# delay of the first restart after a crash, doubled for every further crash
+RESTART_BACKOFF_BASE = 2
+RESTART_BACKOFF_MAX = 60
+# a process running longer than this is considered healthy again
+RESTART_RESET_TIME = 300
+restart_count = 0
+restart_at = None
+process_start_time = 0
+CGROUP_ROOT = "/sys/fs/cgroup/bbb-cam"
+# number of cpus pinned per integration without a cpuset of its own
+SLICE_CPUS = 4
+active_cgroup = None
+last_cgroup_usage = None
+yml = {}
+# the schedule is polled at this interval and additionally pushed by webhook
+SCHEDULE_POLL_INTERVAL = 60
+SCHEDULE_REQUEST_TIMEOUT = 5
+next_schedule_poll = 0
+SCHEDULE_UPDATES = queue.Queue()
+# keys every schedule entry needs
+ENTRY_KEYS = ("id", "start", "stop", "location", "video", "audio")
+# signals ending the wait of the main loop, see wait_for_child_exit()
+WAKE_SIGNALS = {signal.SIGCHLD, signal.SIGUSR1}
+# clock of the supervisor, replaced by a virtual clock in simulations
+get_time = time.time
 
 
 class stream_config(Enum):
@@ -39,7 +75,7 @@ def exit_program() -> NoReturn:
     logging.info("Exiting cam_supervisor!")
     if active_process:
         try:
-            os.kill(active_process[1].pid, signal.SIGINT)
+            active_process[1].send_signal(signal.SIGINT)
         except OSError:
             logging.warning("cam_supervisor could not be killed, "
                             "maybe already killed")
@@ -76,15 +112,26 @@ def get_yaml() -> dict:
             test_schedule = yaml.safe_load(f)
         return test_schedule
 
-    r = requests.get(
-        CONFIGURATION["schedule_url"],
-        auth=(CONFIGURATION["schedule_basic_auth_user"],
-              CONFIGURATION["schedule_basic_auth_password"])
-    )
+    # the schedule is also polled during streams, a failed request keeps
+    # the current config yaml
+    try:
+        r = requests.get(
+            CONFIGURATION["schedule_url"],
+            auth=(CONFIGURATION["schedule_basic_auth_user"],
+                  CONFIGURATION["schedule_basic_auth_password"]),
+            timeout=SCHEDULE_REQUEST_TIMEOUT
+        )
+    except requests.RequestException as e:
+        logging.warning(f"Could not get config yaml: {e}")
+        return {}
 
     if r.status_code == 200:
         logging.info("Successfully retrieved config yaml!")
-        return yaml.safe_load(r.text)
+        try:
+            return yaml.safe_load(r.text)
+        except yaml.YAMLError as e:
+            logging.warning(f"Invalid config yaml: {e}")
+            return {}
     else:
         logging.warning("Could not get config yaml!")
         return {}
@@ -129,19 +176,365 @@ def check_entry(entry: dict) -> bool:
     Returns:
         bool: True, if entry should be active, False otherwise
     """
-    start_ts = parse(entry["start"]).timestamp()
-    stop_ts = parse(entry["stop"]).timestamp()
-    now_ts = time.time()
+    start_ts = parse_timestamp(entry["start"])
+    stop_ts = parse_timestamp(entry["stop"])
+    now_ts = get_time()
 
     return start_ts < now_ts < stop_ts
 
 
-def start_process(entry: dict) -> None:
+@functools.lru_cache(maxsize=4096)
+def parse_timestamp(date: str) -> float:
+    """
+    Parse a date of the schedule, cached as the schedule is checked often
+
+    Args:
+        date (str): Date in the config yaml
+
+    Returns:
+        float: Timestamp of the date
+    """
+    return parse(date).timestamp()
+
+
+def wait_for_child_exit(timeout: float) -> bool:
+    """
+    Wait until a child process exits, a schedule update is pushed (SIGUSR1)
+    or the timeout is reached
+    The signals have to be blocked, see block_child_signal()
+
+    Args:
+        timeout (float): maximum time to wait in seconds
+
+    Returns:
+        bool: True, if a child process exited, False otherwise
+    """
+    info = signal.sigtimedwait(WAKE_SIGNALS, max(timeout, 0))
+    return info is not None and info.si_signo == signal.SIGCHLD
+
+
+def block_child_signal() -> None:
+    """
+    Block SIGCHLD and SIGUSR1, so they stay pending until
+    wait_for_child_exit() picks them up
+    Started integrations inherit the signal mask and unblock the signals
+    themselves, see cam_integration.py
+    """
+    signal.pthread_sigmask(signal.SIG_BLOCK, WAKE_SIGNALS)
+
+
+def get_state_file(entry: dict) -> str:
+    """
+    Get the path of the file the integration of the entry persists its
+    runtime state in
+
+    Args:
+        entry (dict): Schedule entry in the config yaml
+
+    Returns:
+        str: path of the state file
+    """
+    return os.path.join(STATE_DIRECTORY, f"{entry['id']}.json")
+
+
+def remove_state_file(entry: dict) -> None:
+    """
+    Remove the state file of the entry, so the next start is a fresh one
+
+    Args:
+        entry (dict): Schedule entry in the config yaml
+    """
+    try:
+        os.remove(get_state_file(entry))
+    except FileNotFoundError:
+        pass
+
+
+def get_control_socket(entry: dict) -> str:
+    """
+    Get the path of the unix socket the integration of the entry accepts
+    control commands on
+
+    Args:
+        entry (dict): Schedule entry in the config yaml
+
+    Returns:
+        str: path of the control socket
+    """
+    return os.path.join(CONTROL_DIRECTORY, f"{entry['id']}.sock")
+
+
+def send_control_command(socket_path: str, command: str) -> dict:
+    """
+    Send a command to the control socket of a running integration
+
+    Args:
+        socket_path (str): path of the control socket
+        command (str): command, e.g., "mute" or "quality low"
+
+    Returns:
+        dict: reply of the integration
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(60)
+        connection.connect(socket_path)
+        connection.sendall(f"{command}\n".encode())
+        with connection.makefile("r") as reply:
+            return json.loads(reply.readline())
+
+
+def get_restart_delay() -> float:
+    """
+    Get the delay before restarting a crashed process
+    The first crash is restarted immediately, further crashes in a row are
+    delayed exponentially
+
+    Returns:
+        float: delay in seconds
+    """
+    global restart_count
+    if get_time() - process_start_time > RESTART_RESET_TIME:
+        restart_count = 0
+    if restart_count:
+        delay = min(RESTART_BACKOFF_BASE * 2 ** (restart_count - 1),
+                    RESTART_BACKOFF_MAX)
+    else:
+        delay = 0
+    restart_count += 1
+    return delay
+
+
+def parse_cpu_list(cpu_list: str) -> list:
+    """
+    Parse a cpu list in the format of the kernel, e.g., "0-3,8"
+
+    Args:
+        cpu_list (str): cpu list
+
+    Returns:
+        list: sorted numbers of the cpus in the list
+    """
+    cpus = set()
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus: list) -> str:
+    """
+    Format cpus as a cpu list in the format of the kernel
+
+    Args:
+        cpus (list): numbers of the cpus
+
+    Returns:
+        str: cpu list, e.g., "0,1,2,3,8"
+    """
+    return ",".join(str(cpu) for cpu in cpus)
+
+
+def get_cpu_assignment(cpuset: str, pinned: set = frozenset(),
+                       slice_cpus: int = 0) -> tuple:
+    """
+    Split the cpus available to an integration into cpus for the decoder and
+    cpus for the browser, both on the NUMA node with the most available cpus
+
+    Args:
+        cpuset (str): cpu list the integration may use, all cpus of the
+                      supervisor if empty
+        pinned (set): cpus pinned by other slices, which are not used
+        slice_cpus (int): number of cpus to assign, all available if 0
+
+    Returns:
+        tuple: cpu lists for the decoder and for the browser,
+               (None, None) if there are not enough cpus to separate them
+    """
+    if cpuset:
+        available = set(parse_cpu_list(cpuset))
+    else:
+        available = os.sched_getaffinity(0)
+    available -= pinned
+
+    nodes = []
+    for node_cpulist in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        with open(node_cpulist, "r") as f:
+            nodes.append(available & set(parse_cpu_list(f.read())))
+    cpus = sorted(max(nodes, key=len) if nodes else available)
+    if slice_cpus:
+        cpus = cpus[:slice_cpus]
+    if len(cpus) < 2:
+        return None, None
+
+    # a quarter of the cpus suffices for decoding, the browser needs the rest
+    num_decoder_cpus = max(1, len(cpus) // 4)
+    return (format_cpu_list(cpus[:num_decoder_cpus]),
+            format_cpu_list(cpus[num_decoder_cpus:]))
+
+
+def get_pinned_cpus(cgroup: str) -> set:
+    """
+    Get the cpus pinned by the other slices next to the given slice
+
+    Args:
+        cgroup (str): path of the slice
+
+    Returns:
+        set: numbers of the cpus in the cpusets of the other slices
+    """
+    pinned = set()
+    root = os.path.dirname(cgroup)
+    for cpuset_file in glob.glob(os.path.join(root, "*", "cpuset.cpus")):
+        if os.path.dirname(cpuset_file) == cgroup:
+            continue
+        try:
+            with open(cpuset_file, "r") as f:
+                pinned.update(parse_cpu_list(f.read()))
+        except OSError:
+            continue
+    return pinned
+
+
+def assign_cpus(entry: dict, cgroup: str) -> tuple:
+    """
+    Assign cpus for the decoder and the browser to the slice of the entry
+    The cpus are taken from the cpuset of the entry, otherwise
+    cgroup.slice_cpus cpus not pinned by other slices are taken and written
+    into the cpuset of the slice, so integrations on the same host do not
+    share cores
+
+    Args:
+        entry (dict): Schedule entry in the config yaml
+        cgroup (str): path of the slice of the entry
+
+    Returns:
+        tuple: cpu lists for the decoder and for the browser,
+               (None, None) if there are not enough cpus to separate them
+    """
+    cgroup_config = CONFIGURATION.get("cgroup") or {}
+    if cpuset := entry.get("cpuset"):
+        return get_cpu_assignment(str(cpuset))
+
+    # supervisors starting at the same time must not take the same cpus
+    lock = os.open(os.path.dirname(cgroup), os.O_RDONLY)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        decoder_cpus, browser_cpus = get_cpu_assignment(
+            str(cgroup_config.get("cpuset") or ""), get_pinned_cpus(cgroup),
+            cgroup_config.get("slice_cpus", SLICE_CPUS))
+        if not decoder_cpus:
+            logging.warning("No free cpus to pin the integration to")
+            return None, None
+        write_cgroup_file(cgroup, "cpuset.cpus",
+                          f"{decoder_cpus},{browser_cpus}")
+        return decoder_cpus, browser_cpus
+    except OSError as e:
+        logging.warning(f"cpus could not be assigned to {cgroup}: {e}")
+        return None, None
+    finally:
+        os.close(lock)
+
+
+def write_cgroup_file(cgroup: str, name: str, value: str) -> None:
+    """
+    Write a value into an interface file of a cgroup
+
+    Args:
+        cgroup (str): path of the cgroup
+        name (str): name of the interface file
+        value (str): value to be written
+    """
+    with open(os.path.join(cgroup, name), "w") as f:
+        f.write(str(value))
+
+
+def create_cgroup(entry: dict) -> str:
+    """
+    Create the cgroup v2 slice for the integration of the entry and apply
+    the configured cpu weight, memory limit and cpuset
+
+    Args:
+        entry (dict): Schedule entry in the config yaml
+
+    Returns:
+        str: path of the cgroup, None if cgroups are disabled or the cgroup
+             could not be created
+    """
+    cgroup_config = CONFIGURATION.get("cgroup") or {}
+    if not cgroup_config.get("enabled"):
+        return None
+
+    root = cgroup_config.get("root", CGROUP_ROOT)
+    cgroup = os.path.join(root, str(entry["id"]))
+    try:
+        os.makedirs(cgroup, exist_ok=True)
+        # enable the controllers for the slices below the root
+        write_cgroup_file(os.path.dirname(root), "cgroup.subtree_control",
+                          "+cpu +cpuset +memory")
+        write_cgroup_file(root, "cgroup.subtree_control",
+                          "+cpu +cpuset +memory")
+        if cpu_weight := cgroup_config.get("cpu_weight"):
+            write_cgroup_file(cgroup, "cpu.weight", cpu_weight)
+        if memory_max := cgroup_config.get("memory_max"):
+            write_cgroup_file(cgroup, "memory.max", memory_max)
+        if cpuset := entry.get("cpuset") or cgroup_config.get("cpuset"):
+            write_cgroup_file(cgroup, "cpuset.cpus", cpuset)
+    except OSError as e:
+        logging.warning(f"cgroup {cgroup} could not be set up: {e}")
+        return None
+    return cgroup
+
+
+def remove_empty_cgroups() -> None:
+    """
+    Remove slices of integrations that have no processes left
+    """
+    cgroup_config = CONFIGURATION.get("cgroup") or {}
+    root = cgroup_config.get("root", CGROUP_ROOT)
+    for cgroup in glob.glob(os.path.join(root, "*", "")):
+        try:
+            os.rmdir(cgroup)
+        except OSError:
+            # still in use
+            pass
+
+
+def report_cgroup_usage() -> None:
+    """
+    Log the cpu and memory usage of the slice of the active process
+    """
+    global last_cgroup_usage
+    if not active_cgroup:
+        return
+    try:
+        with open(os.path.join(active_cgroup, "cpu.stat"), "r") as f:
+            cpu_stat = dict(line.split() for line in f if line.strip())
+        with open(os.path.join(active_cgroup, "memory.current"), "r") as f:
+            memory = int(f.read())
+    except OSError:
+        return
+
+    now = get_time()
+    usage_usec = int(cpu_stat.get("usage_usec", 0))
+    previous_ts, previous_usec = last_cgroup_usage or (now, usage_usec)
+    last_cgroup_usage = (now, usage_usec)
+    cpu_usage = 0.0
+    if now > previous_ts:
+        cpu_usage = (usage_usec - previous_usec) / (now - previous_ts) / 1e4
+    logging.info(f"Usage of {active_cgroup}: cpu {cpu_usage:.1f}%, "
+                 f"memory {memory / 2**20:.0f} MiB")
+
+
+def start_process(entry: dict, resume: bool = False) -> None:
     """
     Start the process for cam integration
 
     Args:
         entry (dict): Configuration to be used for the stream
+        resume (bool): Whether the process resumes from the state of a
+                       previous process, e.g., after a crash
     """
     location = entry["location"]
     name = entry["id"]
@@ -152,13 +545,57 @@ def start_process(entry: dict) -> None:
     config = get_stream_config(entry)
     access_code = entry.get("access_code")
     video_quality = entry.get("video_quality")
+    adaptive_quality = entry.get("adaptive_quality", False)
 
     command = get_command(cwd, config, location, name,
                           video, audio, infrastructure, access_code,
-                          video_quality)
-    proc = subprocess.Popen(shlex.split(command), shell=False)
-    global active_process
+                          video_quality, adaptive_quality)
+    if not resume:
+        remove_state_file(entry)
+    command += f" --state_file {get_state_file(entry)}"
+    command += f" --control_socket {get_control_socket(entry)}"
+    if profile_directory := CONFIGURATION.get("browser_profile_directory"):
+        command += f" --profile_dir {profile_directory}"
+    if entry.get("standby"):
+        command += " --standby"
+
+    global active_cgroup, last_cgroup_usage
+    remove_empty_cgroups()
+    active_cgroup = create_cgroup(entry)
+    last_cgroup_usage = None
+    cgroup_config = CONFIGURATION.get("cgroup") or {}
+    if active_cgroup and cgroup_config.get("cpu_pinning"):
+        decoder_cpus, browser_cpus = assign_cpus(entry, active_cgroup)
+        if decoder_cpus:
+            command += f" --decoder_cpus {decoder_cpus}"\
+                       f" --browser_cpus {browser_cpus}"
+
+    proc = spawn_process(entry, command)
+    if active_cgroup:
+        # all processes started by the integration inherit the cgroup
+        try:
+            write_cgroup_file(active_cgroup, "cgroup.procs", proc.pid)
+        except OSError as e:
+            logging.warning(f"Process could not be moved to cgroup "
+                            f"{active_cgroup}: {e}")
+    global active_process, process_start_time
     active_process = (entry, proc)
+    process_start_time = get_time()
+
+
+def spawn_process(entry: dict, command: str) -> subprocess.Popen:
+    """
+    Start the cam integration process, replaced by stub processes in
+    simulations
+
+    Args:
+        entry (dict): Configuration to be used for the stream
+        command (str): Command for starting the cam integration
+
+    Returns:
+        subprocess.Popen: the started process
+    """
+    return subprocess.Popen(shlex.split(command), shell=False)
 
 
 def get_infrastructure(yml: dict, room_url: str) -> str:
@@ -202,9 +639,10 @@ def get_stream_config(entry: dict) -> stream_config:
         exit_program()
 
 
-def get_command(cwd: str, config: str, location: str, name: str, video: str,
-                audio: str, infrastructure: str, access_code: str,
-                video_quality: str) -> str:
+def get_command(cwd: str, config: str, location: str, name: str,
+                video: Union[str, list], audio: str, infrastructure: str,
+                access_code: str, video_quality: str,
+                adaptive_quality: bool = False) -> str:
     """
     Construct command for starting cam integration
 
@@ -213,21 +651,25 @@ def get_command(cwd: str, config: str, location: str, name: str, video: str,
         config (stream_config): Describes whether audio/video should be used
         location (str): URL of the meeting room
         name (str): Name to be displayed in the meeting
-        video (str): URL for video stream
+        video (Union[str, list]): URL for video stream, or list of URLs for
+                            several video streams
         audio (str): URL for audio stream
         infrastructure (str): Infrastructure used for the meeting room
         access_code (str): Access code for joining as moderator
         video_quality (str): Video quality to select for the stream
+        adaptive_quality (bool): Whether to adapt the quality to the load
 
     Returns:
         str: Command for starting the cam integration
     """
+    videos = video if isinstance(video, list) else [video]
+    video_args = " ".join(f"--video {url}" for url in videos)
     if config == stream_config.video_and_audio:
         command = f"{PYTHON} {cwd}/cam_integration.py {location} {name} "\
-                  f"{infrastructure} --video {video} --audio {audio}"
+                  f"{infrastructure} {video_args} --audio {audio}"
     elif config == stream_config.video_only:
         command = f"{PYTHON} {cwd}/cam_integration.py {location} {name} "\
-                  f"{infrastructure} --video {video}"
+                  f"{infrastructure} {video_args}"
     else:
         command = f"{PYTHON} {cwd}/cam_integration.py {location} {name} "\
                   f"{infrastructure} --audio {audio}"
@@ -236,10 +678,254 @@ def get_command(cwd: str, config: str, location: str, name: str, video: str,
         command += f" --code {access_code}"
     if video_quality:
         command += f" --video_quality {video_quality}"
+    if adaptive_quality:
+        command += " --adaptive_quality"
 
     return command
 
 
+def check_entries(entries: list) -> str:
+    """
+    Check the shape of pushed schedule entries
+
+    Args:
+        entries (list): schedule entries of an update
+
+    Returns:
+        str: problem of the entries, None if they are valid
+    """
+    if not isinstance(entries, list):
+        return "Expected a list of entries"
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return "Expected entries as mappings"
+        if missing := [key for key in ENTRY_KEYS if key not in entry]:
+            return f"Entry without {', '.join(missing)}"
+        try:
+            parse_timestamp(entry["start"])
+            parse_timestamp(entry["stop"])
+        except (TypeError, ValueError, OverflowError):
+            return f"Entry {entry['id']} with invalid start or stop"
+    return None
+
+
+def check_schedule_update(update: dict) -> str:
+    """
+    Check the shape of a pushed schedule update, see WebhookHandler
+
+    Args:
+        update (dict): update received by the webhook
+
+    Returns:
+        str: problem of the update, None if it can be applied
+    """
+    if "clients" in update:
+        instance = update["clients"].get(
+            CONFIGURATION["schedule_instance_key"]) \
+            if isinstance(update["clients"], dict) else None
+        if not isinstance(instance, dict) or "schedule" not in instance:
+            return "Expected a schedule for this instance in clients"
+        if not isinstance(update.get("infrastructure"), dict):
+            return "Expected a mapping of infrastructure"
+        return check_entries(instance["schedule"])
+    for key in ("schedule", "entries"):
+        if key in update and (problem := check_entries(update[key])):
+            return problem
+    if "remove" in update and not (
+            isinstance(update["remove"], list)
+            and all(isinstance(entry_id, (str, int))
+                    for entry_id in update["remove"])):
+        return "Expected a list of ids to remove"
+    return None
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Accepts pushed schedule updates, which are applied by the main loop
+
+    The body of a POST request is a yaml or json document, either a full
+    config yaml (with "clients"), the complete schedule of this instance
+    ("schedule"), entries to add or replace by their id and start
+    ("entries") and ids to remove ("remove"), or empty to only notify that
+    the schedule changed
+    """
+
+    def do_POST(self) -> None:
+        token = (CONFIGURATION.get("webhook") or {}).get("token", "")
+        authorization = self.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(authorization,
+                                                f"Bearer {token}"):
+            self.send_error(401)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            update = yaml.safe_load(self.rfile.read(length)) or {}
+        except yaml.YAMLError:
+            self.send_error(400, "Invalid yaml")
+            return
+        if not isinstance(update, dict):
+            self.send_error(400, "Expected a mapping")
+            return
+        if problem := check_schedule_update(update):
+            self.send_error(400, problem)
+            return
+        SCHEDULE_UPDATES.put(update)
+        # wake up the main loop, which waits in wait_for_child_exit()
+        signal.pthread_kill(threading.main_thread().ident, signal.SIGUSR1)
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info(f"Webhook: {format % args}")
+
+
+def start_webhook_listener() -> None:
+    """
+    Listen for pushed schedule updates in a background thread, if the
+    webhook is enabled in the configuration
+    """
+    webhook_config = CONFIGURATION.get("webhook") or {}
+    if not webhook_config.get("enabled"):
+        return
+    if not webhook_config.get("token"):
+        logging.error("Webhook is enabled without a token, not starting it!")
+        return
+    address = (webhook_config.get("host", "127.0.0.1"),
+               webhook_config.get("port", 8421))
+    server = http.server.ThreadingHTTPServer(address, WebhookHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Listening for schedule updates on {address[0]}:"
+                 f"{address[1]}")
+
+
+def apply_schedule_update(update: dict) -> None:
+    """
+    Apply a pushed schedule update to the config yaml
+
+    Args:
+        update (dict): update received by the webhook, see WebhookHandler
+    """
+    global yml, next_schedule_poll
+    if "clients" in update:
+        logging.info("Received config yaml by webhook")
+        yml = update
+        return
+    if not any(key in update for key in ("schedule", "entries", "remove")):
+        logging.info("Received schedule change notification by webhook")
+        # fetch the schedule right away
+        next_schedule_poll = 0
+        return
+
+    instance = yml.setdefault("clients", {}).setdefault(
+        CONFIGURATION["schedule_instance_key"], {})
+    schedule = update.get("schedule", instance.get("schedule", []))
+    removed = set(update.get("remove", []))
+    # ids repeat for recurring streams, an entry is replaced by id and start
+    replaced = {(entry["id"], entry["start"])
+                for entry in update.get("entries", [])}
+    schedule = [entry for entry in schedule
+                if entry["id"] not in removed
+                and (entry["id"], entry["start"]) not in replaced]
+    schedule.extend(update.get("entries", []))
+    instance["schedule"] = schedule
+    logging.info(f"Received schedule update by webhook, "
+                 f"{len(schedule)} entries")
+
+
+def update_schedule() -> list:
+    """
+    Apply pushed schedule updates and poll the config yaml, when the poll
+    interval has passed or a change was notified
+
+    Returns:
+        list: Schedule for streams of this instance
+    """
+    global yml, next_schedule_poll
+    while not SCHEDULE_UPDATES.empty():
+        apply_schedule_update(SCHEDULE_UPDATES.get())
+    if get_time() >= next_schedule_poll:
+        next_schedule_poll = get_time() + SCHEDULE_POLL_INTERVAL
+        if newYml := get_yaml():
+            yml = newYml
+    return get_schedule(yml, CONFIGURATION["schedule_instance_key"])
+
+
+def get_active_entry(schedule: list, entry_id: str) -> dict:
+    """
+    Find the entry with the given id that should be active, ids can repeat
+    for recurring streams
+
+    Args:
+        schedule (list): Schedule for streams (from the config yaml)
+        entry_id (str): id of the entry
+
+    Returns:
+        dict: Entry that should be active, or None if there is none
+    """
+    for entry in schedule:
+        if entry["id"] == entry_id and check_entry(entry):
+            return entry
+    return None
+
+
+def supervise() -> float:
+    """
+    Start, stop and restart the cam integration according to the schedule
+
+    Returns:
+        float: Time in seconds until supervise() should be called again,
+               unless a child process exits earlier
+    """
+    global active_process, active_cgroup, restart_count, restart_at
+    timeout = SCHEDULE_POLL_INTERVAL
+    schedule = update_schedule()
+    if active_process:
+        # changed stop times apply right away, other changes with the next
+        # start of the process
+        entry = get_active_entry(schedule, active_process[0]["id"])
+        if entry:
+            active_process = (entry, active_process[1])
+        if not entry:
+            logging.info("Stop time for active process reached!")
+            try:
+                active_process[1].send_signal(signal.SIGINT)
+            except OSError:
+                logging.warning("Active process could not be killed, "
+                                "maybe already killed")
+            remove_state_file(active_process[0])
+            active_process = None
+            active_cgroup = None
+            restart_count = 0
+            restart_at = None
+        elif active_process[1].poll() is not None:
+            if restart_at is None:
+                delay = get_restart_delay()
+                logging.error(f"Active process exited, restarting in "
+                              f"{delay} seconds!")
+                restart_at = get_time() + delay
+            if get_time() >= restart_at:
+                logging.error("Restarting active process!")
+                restart_at = None
+                start_process(active_process[0], resume=True)
+            else:
+                timeout = restart_at - get_time()
+        else:
+            report_cgroup_usage()
+            # wake up just after the stop of the entry
+            timeout = min(timeout, parse_timestamp(active_process[0]["stop"])
+                          - get_time() + 1)
+    elif current_entry := check_schedule(schedule):
+        start_process(current_entry)
+    else:
+        # wake up just after the start of the next entry
+        upcoming = [parse_timestamp(entry["start"]) - get_time() + 1
+                    for entry in schedule]
+        timeout = min([delay for delay in upcoming if delay > 0],
+                      default=timeout)
+
+    return min(timeout, next_schedule_poll - get_time())
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, filename="cam_supervisor.log",
                         filemode="a",
@@ -252,6 +938,10 @@ if __name__ == "__main__":
                         type=str, help="path to the config file")
     parser.add_argument("-t", "--test-schedules", dest="testing", type=str,
                         help="path to a local file with test schedules")
+    parser.add_argument("--control", metavar="COMMAND",
+                        help="send a command (mute, unmute, togglemic, "
+                             "share, unshare, quality <value>, status) to "
+                             "the running integrations and exit")
     args = parser.parse_args()
 
     with open(args.config, 'r') as file:
@@ -260,28 +950,26 @@ if __name__ == "__main__":
     if args.testing:
         CONFIGURATION["test_schedules"] = args.testing
 
-    active_process = None
-    while True:
-        if active_process:
-            if not check_entry(active_process[0]):
-                logging.info("Stop time for active process reached!")
-                try:
-                    os.kill(active_process[1].pid, signal.SIGINT)
-                except OSError:
-                    logging.warning("Active process could not be killed, "
-                                    "maybe already killed")
-                active_process = None
-            elif active_process[1].poll() is not None:
-                logging.error("Restarting active process!")
-                start_process(active_process[0])
-        else:
-            if newYml := get_yaml():
-                yml = newYml
-            schedule = get_schedule(
-                yml, CONFIGURATION["schedule_instance_key"]
-            )
+    CONTROL_DIRECTORY = CONFIGURATION.get("control_directory",
+                                          CONTROL_DIRECTORY)
+    if args.control:
+        for socket_path in glob.glob(os.path.join(CONTROL_DIRECTORY,
+                                                  "*.sock")):
+            try:
+                result = send_control_command(socket_path, args.control)
+            except OSError as e:
+                result = {"ok": False, "error": str(e)}
+            print(f"{socket_path}: {json.dumps(result)}")
+        sys.exit(0)
+
+    STATE_DIRECTORY = CONFIGURATION.get("state_directory", STATE_DIRECTORY)
+    os.makedirs(STATE_DIRECTORY, exist_ok=True)
+    os.makedirs(CONTROL_DIRECTORY, exist_ok=True)
+    SCHEDULE_POLL_INTERVAL = CONFIGURATION.get("schedule_poll_interval",
+                                               SCHEDULE_POLL_INTERVAL)
+    block_child_signal()
+    # started after blocking, so the signals are only picked up by the loop
+    start_webhook_listener()
 
-            if current_entry := check_schedule(schedule):
-                start_process(current_entry)
-
-        time.sleep(60)
+    while True:
+        wait_for_child_exit(supervise())
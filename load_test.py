@@ -0,0 +1,537 @@
+"""
+Find how many streams a host can carry by starting an increasing number of
+cam integrations against a local mock BBB page and a test-pattern RTSP
+source, and report delivered fps, join latency, cpu, memory and restarts
+per step
+"""
+import argparse
+import http.server
+import json
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MOCK_PORT = 8480
+RTSP_PORT = 8554
+SOURCE_FPS = 25
+SOURCE_SIZE = "1280x720"
+VIDEO_QUALITY = None
+INGEST_SLOTS = 8
+# a step is healthy, if every stream delivers this share of the source fps
+FPS_TOLERANCE = 0.9
+# maximum time for all integrations of a step to deliver frames
+JOIN_TIMEOUT = 180
+
+# greenlight room page, the integration enters its name and joins
+MOCK_ROOM_PAGE = """<!DOCTYPE html>
+<html><body>
+<input placeholder="Enter your name!" id="name">
+<button id="room-join" onclick="location.href = '/meeting/' +
+    location.pathname.split('/').pop() + '?name=' +
+    encodeURIComponent(document.getElementById('name').value)">Join</button>
+</body></html>
+"""
+
+# meeting page with the elements the integration uses, the shared camera is
+# sent through a local peer connection and the decoded fps are reported
+MOCK_MEETING_PAGE = """<!DOCTYPE html>
+<html><body>
+<div id="audio-modal">
+  <button aria-label="Microphone" onclick="joinAudio()">Microphone</button>
+  <button aria-label="Listen only" onclick="joinAudio()">Listen only</button>
+</div>
+<button id="webcam" aria-label="Share webcam" onclick="toggleWebcam()">
+  Webcam</button>
+<div id="dialog" hidden>
+  <select id="setCam"></select>
+  <select id="setQuality">
+    <option value="low">low</option>
+    <option value="medium" selected>medium</option>
+    <option value="high">high</option>
+    <option value="hd">hd</option>
+  </select>
+  <button aria-label="Start sharing" onclick="startSharing()">Start</button>
+</div>
+<div data-test="userListContent"><div role="tabpanel"></div></div>
+<video id="remote" autoplay muted playsinline></video>
+<script>
+const room = location.pathname.split("/").pop();
+const name = new URLSearchParams(location.search).get("name");
+const session = Math.random().toString(36).slice(2);
+const sizes = {low: [320, 240], medium: [640, 480], high: [1280, 720],
+               hd: [1920, 1080]};
+let stream = null;
+let connections = [];
+let lastFrames = 0;
+let lastReport = performance.now();
+
+function report(data) {
+    fetch("/report", {method: "POST", body: JSON.stringify(
+        Object.assign({room: room, name: name, session: session}, data))});
+}
+
+function joinAudio() {
+    document.getElementById("audio-modal").hidden = true;
+}
+
+async function toggleWebcam() {
+    if (stream) {
+        stream.getTracks().forEach(track => track.stop());
+        connections.forEach(pc => pc.close());
+        stream = null;
+        connections = [];
+        setWebcamLabel("Share webcam");
+        return;
+    }
+    // access is needed for the labels of the devices
+    const probe = await navigator.mediaDevices.getUserMedia({video: true});
+    probe.getTracks().forEach(track => track.stop());
+    const select = document.getElementById("setCam");
+    select.innerHTML = "";
+    const devices = await navigator.mediaDevices.enumerateDevices();
+    devices.filter(device => device.kind === "videoinput")
+        .forEach(device => select.add(new Option(device.label,
+                                                 device.deviceId)));
+    document.getElementById("dialog").hidden = false;
+}
+
+function setWebcamLabel(label) {
+    document.getElementById("webcam").setAttribute("aria-label", label);
+}
+
+async function startSharing() {
+    const size = sizes[document.getElementById("setQuality").value];
+    stream = await navigator.mediaDevices.getUserMedia({video: {
+        deviceId: {exact: document.getElementById("setCam").value},
+        width: size[0], height: size[1]}});
+    const sender = new RTCPeerConnection();
+    const receiver = new RTCPeerConnection();
+    sender.onicecandidate = e => e.candidate &&
+        receiver.addIceCandidate(e.candidate);
+    receiver.onicecandidate = e => e.candidate &&
+        sender.addIceCandidate(e.candidate);
+    receiver.ontrack = e => {
+        document.getElementById("remote").srcObject = e.streams[0];
+    };
+    stream.getTracks().forEach(track => sender.addTrack(track, stream));
+    await sender.setLocalDescription(await sender.createOffer());
+    await receiver.setRemoteDescription(sender.localDescription);
+    await receiver.setLocalDescription(await receiver.createAnswer());
+    await sender.setRemoteDescription(receiver.localDescription);
+    connections = [sender, receiver];
+    lastFrames = 0;
+    document.getElementById("dialog").hidden = true;
+    setWebcamLabel("Stop sharing webcam");
+}
+
+setInterval(async () => {
+    let frames = 0;
+    if (connections.length) {
+        const stats = await connections[1].getStats();
+        stats.forEach(stat => {
+            if (stat.type === "inbound-rtp" && stat.kind === "video") {
+                frames = stat.framesDecoded;
+            }
+        });
+    }
+    const now = performance.now();
+    const fps = Math.max(frames - lastFrames, 0) * 1000 / (now - lastReport);
+    lastFrames = frames;
+    lastReport = now;
+    report({fps: fps, shared: Boolean(stream)});
+}, 5000);
+report({fps: 0, shared: false});
+</script>
+</body></html>
+"""
+
+# reports of the mock pages per room, see MockBBBHandler
+rooms = {}
+rooms_lock = threading.Lock()
+
+
+class MockBBBHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the mock room and meeting pages and collects their reports
+    """
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/room/"):
+            page = MOCK_ROOM_PAGE
+        elif self.path.startswith("/meeting/"):
+            page = MOCK_MEETING_PAGE
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(page.encode())
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length))
+        now = time.time()
+        with rooms_lock:
+            room = rooms.setdefault(data["room"], {
+                "sessions": [], "first_frame_ts": None, "samples": []})
+            session = (data["name"], data["session"])
+            if session not in room["sessions"]:
+                room["sessions"].append(session)
+            if data["fps"] > 0 and room["first_frame_ts"] is None:
+                room["first_frame_ts"] = now
+            room["samples"].append((now, data["fps"]))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"Mock BBB: {format % args}")
+
+
+class Integration:
+    """
+    A cam integration process joining one mock room, restarted when it exits
+    like the supervisor would
+    """
+
+    def __init__(self, index: int, stream_url: str, directory: str) -> None:
+        self.index = index
+        self.room = f"load{index}"
+        self.stream_url = stream_url
+        self.directory = directory
+        self.restarts = 0
+        self.process = None
+        self.start_ts = None
+        self.start()
+
+    def start(self) -> None:
+        """
+        Start the cam integration process
+        """
+        files = os.path.join(self.directory, self.room)
+        # the name tells rejoins of a process apart from restarts
+        name = f"{self.room}_{self.restarts}"
+        command = f"{sys.executable} cam_integration.py"\
+                  f" http://127.0.0.1:{MOCK_PORT}/room/{self.room}"\
+                  f" {name} greenlight --video {self.stream_url}"\
+                  f" --trace_file {files}_trace.jsonl"\
+                  f" --stats_file {files}_stats.jsonl"\
+                  f" --state_file {files}_state.json"\
+                  f" --ingest_slots {INGEST_SLOTS}"
+        if VIDEO_QUALITY:
+            command += f" --video_quality {VIDEO_QUALITY}"
+        self.process = subprocess.Popen(shlex.split(command),
+                                        stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+        if self.start_ts is None:
+            self.start_ts = time.time()
+
+    def check(self) -> None:
+        """
+        Restart the process, if it exited
+        """
+        if self.process.poll() is not None:
+            logging.warning(f"Integration {self.room} exited with "
+                            f"{self.process.returncode}, restarting")
+            self.restarts += 1
+            self.start()
+
+    def stop(self) -> None:
+        """
+        Stop the process like the supervisor does at the end of a stream
+        """
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+
+    def get_room(self) -> dict:
+        """
+        Returns:
+            dict: reports of the mock page of the integration
+        """
+        with rooms_lock:
+            room = rooms.get(self.room)
+            return dict(room) if room else None
+
+    def get_restarts(self) -> int:
+        """
+        Returns:
+            int: process restarts and rejoins of the meeting so far
+        """
+        room = self.get_room()
+        if not room:
+            return self.restarts
+        names = {name for name, _ in room["sessions"]}
+        return self.restarts + len(room["sessions"]) - len(names)
+
+
+def start_test_source(rtsp_server: str) -> list:
+    """
+    Start the rtsp server and publish a test pattern to it
+
+    Args:
+        rtsp_server (str): command of the rtsp server, e.g., mediamtx
+
+    Returns:
+        list: started processes
+    """
+    server = subprocess.Popen(shlex.split(rtsp_server),
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    time.sleep(2)
+    command = f"ffmpeg -hide_banner -loglevel error -re -f lavfi"\
+              f" -i testsrc2=size={SOURCE_SIZE}:rate={SOURCE_FPS}"\
+              f" -c:v libx264 -preset ultrafast -tune zerolatency"\
+              f" -g {SOURCE_FPS * 2} -f rtsp -rtsp_transport tcp"\
+              f" rtsp://127.0.0.1:{RTSP_PORT}/test"
+    publisher = subprocess.Popen(shlex.split(command))
+    time.sleep(2)
+    return [server, publisher]
+
+
+def get_cpu_times() -> tuple:
+    """
+    Returns:
+        tuple: busy and total cpu time of the host in clock ticks
+    """
+    with open("/proc/stat", "r") as f:
+        values = [int(value) for value in f.readline().split()[1:]]
+    # idle and iowait
+    idle = values[3] + values[4]
+    return sum(values) - idle, sum(values)
+
+
+def get_used_memory() -> float:
+    """
+    Returns:
+        float: used memory of the host in MiB
+    """
+    meminfo = {}
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            meminfo[key] = int(value.split()[0])
+    return (meminfo["MemTotal"] - meminfo["MemAvailable"]) / 1024
+
+
+def wait(integrations: list, duration: float) -> None:
+    """
+    Wait for the given time, restarting exited integrations meanwhile
+
+    Args:
+        integrations (list): running integrations
+        duration (float): time to wait in seconds
+    """
+    end_ts = time.time() + duration
+    while time.time() < end_ts:
+        for integration in integrations:
+            integration.check()
+        time.sleep(1)
+
+
+def wait_for_frames(integrations: list) -> None:
+    """
+    Wait until every integration delivered frames to its mock page
+
+    Args:
+        integrations (list): running integrations
+    """
+    end_ts = time.time() + JOIN_TIMEOUT
+    while time.time() < end_ts:
+        rooms_with_frames = [integration for integration in integrations
+                             if (room := integration.get_room())
+                             and room["first_frame_ts"]]
+        if len(rooms_with_frames) == len(integrations):
+            return
+        wait(integrations, 1)
+    logging.warning("Not all integrations delivered frames in time")
+
+
+def measure_step(integrations: list, new_integrations: list,
+                 duration: float) -> dict:
+    """
+    Measure the delivered fps and the host resources of the running
+    integrations
+
+    Args:
+        integrations (list): running integrations
+        new_integrations (list): integrations started in this step
+        duration (float): length of the measurement in seconds
+
+    Returns:
+        dict: results of the step
+    """
+    restarts = sum(integration.get_restarts() for integration in integrations)
+    busy, total = get_cpu_times()
+    memory = []
+    start_ts = time.time()
+    end_ts = start_ts + duration
+    while time.time() < end_ts:
+        wait(integrations, min(5, end_ts - time.time()))
+        memory.append(get_used_memory())
+    end_busy, end_total = get_cpu_times()
+
+    stream_fps = []
+    for integration in integrations:
+        room = integration.get_room() or {"samples": []}
+        samples = [fps for ts, fps in room["samples"] if ts >= start_ts]
+        stream_fps.append(sum(samples) / len(samples) if samples else 0)
+    join_latencies = [
+        room["first_frame_ts"] - integration.start_ts
+        for integration in new_integrations
+        if (room := integration.get_room()) and room["first_frame_ts"]]
+    restarts = sum(integration.get_restarts()
+                   for integration in integrations) - restarts
+
+    return {
+        "streams": len(integrations),
+        "mean_fps": sum(stream_fps) / len(stream_fps),
+        "min_fps": min(stream_fps),
+        "join_latency": (sum(join_latencies) / len(join_latencies)
+                         if join_latencies else None),
+        "joined": len(join_latencies),
+        "cpu": 100 * (end_busy - busy) / max(end_total - total, 1),
+        "memory": max(memory),
+        "restarts_per_hour": restarts * 3600 / duration,
+    }
+
+
+def is_healthy(result: dict) -> bool:
+    """
+    Check whether every stream of a step was delivered without drops
+
+    Args:
+        result (dict): results of the step
+
+    Returns:
+        bool: True, if every stream delivered enough fps without restarts
+    """
+    return result["min_fps"] >= FPS_TOLERANCE * SOURCE_FPS \
+        and result["restarts_per_hour"] == 0
+
+
+def print_result(result: dict) -> None:
+    """
+    Print the results of a step as a row of the report
+
+    Args:
+        result (dict): results of the step
+    """
+    join_latency = f"{result['join_latency']:.1f}s" \
+        if result["join_latency"] is not None else "-"
+    print(f"{result['streams']:>7} {result['mean_fps']:>8.1f}"
+          f" {result['min_fps']:>7.1f} {join_latency:>8}"
+          f" {result['cpu']:>5.0f}% {result['memory']:>8.0f}"
+          f" {result['restarts_per_hour']:>10.1f}"
+          f" {'' if is_healthy(result) else 'dropping'}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max_streams", type=int, default=8,
+                        help="maximum number of streams to start")
+    parser.add_argument("--step", type=int, default=1,
+                        help="number of streams added per step")
+    parser.add_argument("--settle", type=float, default=30,
+                        help="time in seconds to wait after all streams "
+                             "of a step delivered frames")
+    parser.add_argument("--duration", type=float, default=60,
+                        help="length of the measurement of a step")
+    parser.add_argument("--video_quality",
+                        help="video quality to share the cameras with")
+    parser.add_argument("--source_fps", type=int, default=SOURCE_FPS,
+                        help="frame rate of the test pattern")
+    parser.add_argument("--source_size", default=SOURCE_SIZE,
+                        help="resolution of the test pattern")
+    parser.add_argument("--fps_tolerance", type=float, default=FPS_TOLERANCE,
+                        help="share of the source fps every stream has to "
+                             "deliver for a step to be healthy")
+    parser.add_argument("--shared_ingest", action="store_true",
+                        help="let all integrations share one ingest")
+    parser.add_argument("--rtsp_server", default="mediamtx",
+                        help="command to start an rtsp server listening on "
+                             f"port {RTSP_PORT}")
+    parser.add_argument("--keep_going", action="store_true",
+                        help="continue after the first step dropping frames")
+    parser.add_argument("--output", help="file to write the results to as "
+                                         "json")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print the log of the load test")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(levelname)s - %(message)s")
+
+    SOURCE_FPS = args.source_fps
+    SOURCE_SIZE = args.source_size
+    FPS_TOLERANCE = args.fps_tolerance
+    VIDEO_QUALITY = args.video_quality
+    INGEST_SLOTS = max(args.max_streams, INGEST_SLOTS)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", MOCK_PORT),
+                                             MockBBBHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    source_processes = start_test_source(args.rtsp_server)
+    directory = tempfile.mkdtemp(prefix="bbb_cam_load_")
+
+    integrations = []
+    results = []
+    print("streams mean_fps min_fps join_lat   cpu   mem_mb  restarts/h")
+    try:
+        while len(integrations) < args.max_streams:
+            count = min(len(integrations) + args.step, args.max_streams)
+            new_integrations = []
+            while len(integrations) < count:
+                index = len(integrations)
+                stream_url = f"rtsp://127.0.0.1:{RTSP_PORT}/test"
+                if not args.shared_ingest:
+                    # separate ingests of the same source
+                    stream_url += f"?stream={index}"
+                integration = Integration(index, stream_url, directory)
+                integrations.append(integration)
+                new_integrations.append(integration)
+            wait_for_frames(integrations)
+            wait(integrations, args.settle)
+            result = measure_step(integrations, new_integrations,
+                                  args.duration)
+            results.append(result)
+            print_result(result)
+            if not is_healthy(result) and not args.keep_going:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for integration in integrations:
+            integration.stop()
+        for integration in integrations:
+            try:
+                integration.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                integration.process.kill()
+        for process in source_processes:
+            process.terminate()
+
+    # the knee is the last step before the first step dropping frames
+    healthy = [result["streams"] for result in results
+               if is_healthy(result)]
+    unhealthy = [result["streams"] for result in results
+                 if not is_healthy(result)]
+    if unhealthy:
+        capacity = max([streams for streams in healthy
+                        if streams < unhealthy[0]], default=0)
+        print(f"knee: frames drop at {unhealthy[0]} streams, the host "
+              f"carries {capacity} streams")
+    elif results:
+        print(f"no drops up to {results[-1]['streams']} streams")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"source_fps": SOURCE_FPS, "source_size": SOURCE_SIZE,
+                       "video_quality": VIDEO_QUALITY, "steps": results}, f,
+                      indent=2)
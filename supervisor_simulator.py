@@ -0,0 +1,303 @@
+"""
+Replay a schedule through cam_supervisor on a virtual clock with stub
+integration processes and report how accurately it was followed
+"""
+import argparse
+import heapq
+import itertools
+import logging
+import random
+import signal
+import statistics
+import tempfile
+import yaml
+
+import cam_supervisor
+
+clock = None
+processes = []
+pids = itertools.count(1000)
+
+
+class VirtualClock:
+    """
+    Clock that jumps to the next scheduled event instead of waiting
+    """
+
+    def __init__(self, start: float) -> None:
+        self.now = start
+        self.events = []
+        self.sequence = itertools.count()
+
+    def time(self) -> float:
+        """
+        Returns:
+            float: Current virtual timestamp
+        """
+        return self.now
+
+    def schedule(self, delay: float, callback) -> None:
+        """
+        Call callback after delay seconds of virtual time
+
+        Args:
+            delay (float): delay in seconds
+            callback (callable): function without arguments
+        """
+        heapq.heappush(self.events,
+                       (self.now + delay, next(self.sequence), callback))
+
+    def wait_for_child_exit(self, timeout: float) -> bool:
+        """
+        Advance the clock until a stub process exits or the timeout is
+        reached, like cam_supervisor.wait_for_child_exit()
+
+        Args:
+            timeout (float): maximum time to wait in seconds
+
+        Returns:
+            bool: True, if a stub process exited, False on timeout
+        """
+        deadline = self.now + max(timeout, 0)
+        while self.events and self.events[0][0] <= deadline:
+            event_ts, _, callback = heapq.heappop(self.events)
+            self.now = event_ts
+            if callback():
+                return True
+        self.now = deadline
+        return False
+
+
+class StubProcess:
+    """
+    Stand-in for a cam_integration process following a scripted behaviour
+
+    The behaviour is "run" (exit on SIGINT), "crash:<seconds>" (exit on its
+    own after the given time) or "hang" (ignore SIGINT)
+    """
+
+    def __init__(self, entry: dict, behaviour: str) -> None:
+        self.entry = entry
+        self.behaviour = behaviour
+        self.pid = next(pids)
+        self.returncode = None
+        self.start_ts = clock.time()
+        self.exit_ts = None
+        self.signal_ts = None
+        if behaviour.startswith("crash:"):
+            clock.schedule(float(behaviour.split(":", 1)[1]),
+                           lambda: self.exit(1))
+
+    def exit(self, returncode: int) -> bool:
+        """
+        Let the process exit, if it is still running
+
+        Args:
+            returncode (int): exit code of the process
+
+        Returns:
+            bool: True, if the process exited now
+        """
+        if self.returncode is not None:
+            return False
+        self.returncode = returncode
+        self.exit_ts = clock.time()
+        return True
+
+    def poll(self) -> int:
+        """
+        Returns:
+            int: exit code of the process, None if it is still running
+        """
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        """
+        Deliver a signal, SIGINT ends the process after a short shutdown
+
+        Args:
+            sig (int): signal to be sent
+        """
+        if self.signal_ts is None:
+            self.signal_ts = clock.time()
+        if sig == signal.SIGINT and self.behaviour != "hang":
+            clock.schedule(SHUTDOWN_TIME, lambda: self.exit(0))
+
+
+SHUTDOWN_TIME = 2.0
+CRASH_PROBABILITY = 0.0
+HANG_PROBABILITY = 0.0
+MEAN_CRASH_TIME = 1800.0
+
+
+def get_behaviour(entry: dict, start_number: int) -> str:
+    """
+    Get the behaviour of the stub process for the given start of an entry
+    The behaviours can be scripted per entry with a "simulation" list in the
+    schedule, otherwise they are chosen randomly
+
+    Args:
+        entry (dict): Schedule entry in the config yaml
+        start_number (int): number of previous starts of the entry
+
+    Returns:
+        str: behaviour of the stub process
+    """
+    if scripted := entry.get("simulation"):
+        return scripted[min(start_number, len(scripted) - 1)]
+    chance = random.random()
+    if chance < CRASH_PROBABILITY:
+        return f"crash:{random.expovariate(1 / MEAN_CRASH_TIME):.0f}"
+    if chance < CRASH_PROBABILITY + HANG_PROBABILITY:
+        return "hang"
+    return "run"
+
+
+def spawn_stub_process(entry: dict, command: str) -> StubProcess:
+    """
+    Replacement of cam_supervisor.spawn_process() starting a stub process
+
+    Args:
+        entry (dict): Configuration to be used for the stream
+        command (str): Command that would start the cam integration
+
+    Returns:
+        StubProcess: the started stub process
+    """
+    start_number = sum(1 for process in processes if process.entry is entry)
+    process = StubProcess(entry, get_behaviour(entry, start_number))
+    processes.append(process)
+    return process
+
+
+def summarize(values: list) -> str:
+    """
+    Summarize a list of durations
+
+    Args:
+        values (list): durations in seconds
+
+    Returns:
+        str: count, mean, 95th percentile and maximum
+    """
+    if not values:
+        return "n=0"
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+    return f"n={len(values)} mean={statistics.mean(values):.1f}s "\
+           f"p95={p95:.1f}s max={values[-1]:.1f}s"
+
+
+def get_peak_concurrency(end_ts: float) -> int:
+    """
+    Get the maximum number of stub processes running at the same time
+
+    Args:
+        end_ts (float): end of the simulation, for processes still running
+
+    Returns:
+        int: peak number of concurrent processes
+    """
+    changes = []
+    for process in processes:
+        changes.append((process.start_ts, 1))
+        changes.append((process.exit_ts or end_ts, -1))
+    peak = running = 0
+    # exits before starts at the same time
+    for _, change in sorted(changes, key=lambda c: (c[0], c[1])):
+        running += change
+        peak = max(peak, running)
+    return peak
+
+
+def report(schedule: list, end_ts: float) -> None:
+    """
+    Print scheduling accuracy, overlaps, restarts and concurrency
+
+    Args:
+        schedule (list): Schedule for streams (from the config yaml)
+        end_ts (float): end of the simulation
+    """
+    parse_timestamp = cam_supervisor.parse_timestamp
+    start_lateness = []
+    stop_lateness = []
+    restart_latency = []
+    missed = []
+    for entry in schedule:
+        entry_processes = [process for process in processes
+                           if process.entry is entry]
+        if not entry_processes:
+            missed.append(entry)
+            continue
+        start_lateness.append(entry_processes[0].start_ts
+                              - parse_timestamp(entry["start"]))
+        last = entry_processes[-1]
+        stop_ts = parse_timestamp(entry["stop"])
+        if last.exit_ts and last.returncode == 0:
+            stop_lateness.append(last.exit_ts - stop_ts)
+        for crashed, restarted in zip(entry_processes, entry_processes[1:]):
+            restart_latency.append(restarted.start_ts - crashed.exit_ts)
+
+    overlapping = [
+        entry for entry in schedule
+        if any(other is not entry
+               and parse_timestamp(other["start"])
+               < parse_timestamp(entry["stop"])
+               and parse_timestamp(entry["start"])
+               < parse_timestamp(other["stop"])
+               for other in schedule)]
+
+    print(f"entries: {len(schedule)}, starts: {len(processes)}")
+    print(f"start lateness: {summarize(start_lateness)}")
+    print(f"stop lateness: {summarize(stop_lateness)}")
+    print(f"restart latency: {summarize(restart_latency)}")
+    print(f"crashes: {sum(1 for p in processes if p.returncode == 1)}, "
+          f"hung processes: {sum(1 for p in processes if p.exit_ts is None)}")
+    print(f"overlapping entries: {len(overlapping)}, of these never "
+          f"started: {sum(1 for entry in overlapping if entry in missed)}")
+    print(f"missed entries: {len(missed)}")
+    for entry in missed:
+        print(f"  {entry['id']} {entry['start']} - {entry['stop']}")
+    print(f"peak concurrent streams: {get_peak_concurrency(end_ts)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("schedules", help="path to a schedule config yaml")
+    parser.add_argument("instance", help="instance key of the schedule")
+    parser.add_argument("--crash-probability", type=float, default=0.0,
+                        help="probability that a start crashes")
+    parser.add_argument("--hang-probability", type=float, default=0.0,
+                        help="probability that a start ignores SIGINT")
+    parser.add_argument("--seed", type=int, help="seed for the behaviours")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print the log of the supervisor")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.CRITICAL,
+        format="%(levelname)s - %(message)s")
+
+    random.seed(args.seed)
+    CRASH_PROBABILITY = args.crash_probability
+    HANG_PROBABILITY = args.hang_probability
+
+    with open(args.schedules, "r") as f:
+        schedule_config = yaml.safe_load(f)
+    schedule = cam_supervisor.get_schedule(schedule_config, args.instance)
+    start_ts = min(cam_supervisor.parse_timestamp(entry["start"])
+                   for entry in schedule) - 3600
+    end_ts = max(cam_supervisor.parse_timestamp(entry["stop"])
+                 for entry in schedule) + 3600
+
+    clock = VirtualClock(start_ts)
+    cam_supervisor.CONFIGURATION = {"schedule_instance_key": args.instance}
+    cam_supervisor.STATE_DIRECTORY = tempfile.mkdtemp()
+    cam_supervisor.get_time = clock.time
+    cam_supervisor.get_yaml = lambda: schedule_config
+    cam_supervisor.spawn_process = spawn_stub_process
+
+    while clock.time() < end_ts:
+        clock.wait_for_child_exit(cam_supervisor.supervise())
+
+    report(schedule, end_ts)